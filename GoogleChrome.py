@@ -1,99 +1,277 @@
-from talon.voice import Context, Key, press, Str
-from user.utils import parse_words_as_integer
+from talon import ui
+from talon.engine import engine
+from user.keystrokes import Key, Plan
+from user.utils import lazy_context, numerals, with_number
+from user import shared_keymap
+import collections, functools
 
 # It is recommended to use this script in tandem with Vimium, a Google Chrome plugin for controlling the browser via keyboard
 # https://vimium.github.io/
 
-context = Context('GoogleChrome', bundle='com.google.Chrome')
+# Skip keystrokes that wouldn't change anything, like reopening the console panel while it is already showing
+track_devtools_state = True
 
-def open_focus_devtools(m):
-    press('cmd-shift-c')
+# What the current tab is known to have focused, and which devtools panel it is known to be showing, or None when unknown
+# Only trusted from one command of this script to the next: any other phrase in between, or a change of window focus, may have changed them
+class DevtoolsState:
+    def __init__(self):
+        self.phrases = 0
+        self.known_at = None
+        self.reset()
 
+    def reset(self):
+        # 'devtools', 'page', or 'address bar'
+        self.focus = None
+        self.panel = None
+
+    def check(self):
+        if not track_devtools_state or self.known_at is None or self.phrases - self.known_at > 1:
+            self.reset()
+
+state = DevtoolsState()
+
+def on_phrase(m):
+    state.phrases += 1
+
+engine.register('phrase', on_phrase)
+
+ui.register('win_focus', lambda win: state.reset())
+
+# For commands that use and update the state
+def devtools_command(function):
+    @functools.wraps(function)
+    def command(*args):
+        state.check()
+        function(*args)
+        state.known_at = state.phrases
+    return command
+
+# Helpers that add their keystrokes to a Plan, so a whole command is sent at once
+
+def open_focus_devtools(plan):
+    if state.focus != 'devtools':
+        # Also opens the Elements panel, to inspect an element
+        plan.key('cmd-shift-c')
+        state.focus = 'devtools'
+        state.panel = 'Elements'
+    return plan
+
+@devtools_command
 def show_panel(name):
-    open_focus_devtools(None)
+    plan = open_focus_devtools(Plan())
 
-    # Open command menu
-    press('cmd-shift-p')
+    if state.panel != name:
+        # Open command menu
+        plan.key('cmd-shift-p')
 
-    Str('Show %s'%(name))(None)
-    press('enter')
+        plan.text('Show %s'%(name))
+        plan.key('enter')
+        state.panel = name
 
+    plan.send()
+
+@devtools_command
 def next_panel(m):
-    open_focus_devtools(None)
-    press('cmd-]')
+    open_focus_devtools(Plan()).key('cmd-]').send()
+    state.panel = None
 
+@devtools_command
 def last_panel(m):
-    open_focus_devtools(None)
-    press('cmd-[')
+    open_focus_devtools(Plan()).key('cmd-[').send()
+    state.panel = None
+
+@devtools_command
+def focus_devtools(m):
+    open_focus_devtools(Plan()).send()
+
+def focus_address_bar(plan):
+    state.focus = 'address bar'
+    return plan.key('cmd-l')
 
-def focus_address_bar(m):
-    press('cmd-l')
+@devtools_command
+def address_bar(m):
+    focus_address_bar(Plan()).send()
 
 # Return focus from the devtools to the page
-def refocus_page(m):
-    focus_address_bar(None)
+def refocus_page(plan):
+    if state.focus == 'page':
+        return plan
+
+    focus_address_bar(plan)
 
     # Escape button
     # This leaves the focus on the page at previous tab focused point, not the beginning of the page
-    press('escape')
+    state.focus = 'page'
+    return plan.key('escape')
+
+@devtools_command
+def refocus(m):
+    refocus_page(Plan()).send()
 
+@devtools_command
 def back(m):
-    refocus_page(None)
-    press('cmd-[')
+    refocus_page(Plan()).key('cmd-[').send()
 
+@devtools_command
 def forward(m):
-    refocus_page(None)
-    press('cmd-]')
-
-def jump_tab(m):
-    tab_number = parse_words_as_integer(m._words[1:])
-    if tab_number != None and tab_number > 0 and tab_number < 9:
-        press('cmd-%s'%tab_number)
-
-
-context.keymap({
-    'address bar': focus_address_bar,
-
-    'back[ward]': back,
-    'forward': forward,
-    'reload': Key('cmd-r'),
-    'hard reload': Key('cmd-shift-r'),
-
-    'new tab': Key('cmd-t'),
-    'close tab': Key('cmd-w'),
-    '(reopen | unclose) tab': Key('cmd-shift-t'),
-
-    'next tab': Key('cmd-alt-right'),
-    '(last | prevous) tab': Key('cmd-alt-left'),
-
-    'tab (1 | 2 | 3 | 4 | 5 | 6 | 7 | 8)': jump_tab,
-    '(end | rightmost) tab': Key('cmd-9'),
-
-    'find': Key('cmd-f'),
-    'next': Key('cmd-g'),
-    '(last | prevous)': Key('cmd-shift-g'),
-
-    'toggle dev tools': Key('cmd-alt-i'),
-
-    'command [menu]': Key('cmd-shift-p'),
-    'next panel': next_panel,
-    '(last | prevous) panel': last_panel,
-    '[show] application [panel]': lambda m: show_panel('Application'),
-    '[show] audit[s] [panel]': lambda m: show_panel('Audits'),
-    '[show] console [panel]': lambda m: show_panel('Console'),
-    '[show] element[s] [panel]': lambda m: show_panel('Elements'),
-    '[show] memory [panel]': lambda m: show_panel('Memory'),
-    '[show] network [panel]': lambda m: show_panel('Network'),
-    '[show] performance [panel]': lambda m: show_panel('Performance'),
-    '[show] security [panel]': lambda m: show_panel('Security'),
-    '[show] source[s] [panel]': lambda m: show_panel('Sources'),
-
-    'refocus page': refocus_page,
-    '[refocus] dev tools': open_focus_devtools,
-
-    # Clipboard
-    'cut': Key('cmd-x'),
-    'copy': Key('cmd-c'),
-    'paste': Key('cmd-v'),
-    'paste same style': Key('cmd-alt-shift-v'),
-})
+    refocus_page(Plan()).key('cmd-]').send()
+
+# The index of the focused tab and the number of tabs in the window, each None when unknown
+# Tracked through the tab commands of this script, separately for each window
+# Switching tabs by mouse, Vimium, or keys.py shortcuts goes unnoticed, so the tracked tab is only used to shorten paths beyond tab 8
+class TabState:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.current = None
+        self.count = None
+
+# The TabState of each recently focused window, by window id, so switching to another window and back keeps it
+tab_window_limit = 64
+tab_states = collections.OrderedDict()
+
+# The TabState of the focused window
+tabs = TabState()
+
+def on_win_focus(win):
+    global tabs
+
+    tabs = tab_states.get(win.id)
+    if tabs is None:
+        tabs = tab_states[win.id] = TabState()
+        if len(tab_states) > tab_window_limit:
+            # Forget the least recently focused window
+            tab_states.popitem(last=False)
+    else:
+        tab_states.move_to_end(win.id)
+
+ui.register('win_focus', on_win_focus)
+
+# Returns the fewest chords that focus the given tab
+# Tabs 1-8 are always jumped to directly with cmd-N
+# Beyond tab 8, the path is cmd-9 (the last tab) or cmd-8 then walking, or walking from the tracked tab, which Chrome wraps around past either end
+# Without the tab count, only paths that never walk past the given tab are used, since walking past the last tab would wrap around to the first
+def plan_tab_path(tab_number, current=None, count=None):
+    if count is None:
+        if tab_number < 9:
+            return ['cmd-%d'%(tab_number)]
+
+        paths = [['cmd-8'] + ['cmd-alt-right'] * (tab_number - 8)]
+        if current is not None and current != tab_number:
+            distance = tab_number - current
+            paths.append(['cmd-alt-right'] * distance if distance > 0 else ['cmd-alt-left'] * -distance)
+        return min(paths, key=len)
+
+    tab_number = min(tab_number, count)
+    if tab_number < 9 and tab_number < count:
+        return ['cmd-%d'%(tab_number)]
+
+    paths = [['cmd-9'] + ['cmd-alt-left'] * (count - tab_number)]
+    if tab_number > 8:
+        paths.append(['cmd-8'] + ['cmd-alt-right'] * (tab_number - 8))
+    if current is not None and current != tab_number:
+        distance = tab_number - current
+        if distance > 0:
+            paths += [['cmd-alt-right'] * distance, ['cmd-alt-left'] * (count - distance)]
+        else:
+            paths += [['cmd-alt-left'] * -distance, ['cmd-alt-right'] * (count + distance)]
+
+    # The first path is preferred on a tie, since a direct jump doesn't depend on the tracked tab
+    return min(paths, key=len)
+
+def jump_tab(m, tab_number):
+    if tab_number == None or tab_number < 1:
+        return
+
+    # The whole path is sent at once
+    Plan().key(' '.join(plan_tab_path(tab_number, tabs.current, tabs.count))).send()
+    tabs.current = tab_number if tabs.count is None else min(tab_number, tabs.count)
+
+def set_tab_count(m, tab_count):
+    if tab_count != None and tab_count > 0:
+        tabs.count = tab_count
+        if tabs.current is not None and tabs.current > tab_count:
+            tabs.current = None
+
+def step_tab(direction):
+    def step(m):
+        Plan().key('cmd-alt-right' if direction > 0 else 'cmd-alt-left').send()
+        if tabs.current is not None:
+            tabs.current += direction
+            if tabs.count is not None:
+                tabs.current = (tabs.current - 1) % tabs.count + 1
+            elif tabs.current < 1:
+                tabs.current = None
+    return step
+
+def rightmost_tab(m):
+    Plan().key('cmd-9').send()
+    tabs.current = tabs.count
+
+# New tabs open at the end
+def new_tab(m):
+    Plan().key('cmd-t').send()
+    if tabs.count is not None:
+        tabs.count += 1
+    tabs.current = tabs.count
+
+def close_tab(m):
+    Plan().key('cmd-w').send()
+    if tabs.count is not None:
+        tabs.count -= 1
+    # Chrome may focus the tab to either side, or the one that opened the closed tab
+    tabs.current = None
+
+# Reopened tabs return to where they were
+def reopen_tab(m):
+    Plan().key('cmd-shift-t').send()
+    if tabs.count is not None:
+        tabs.count += 1
+    tabs.current = None
+
+
+# Only built once the application has focus, see utils.lazy_context
+def build_keymap():
+    return shared_keymap.keymap(['clipboard', 'find'], {
+        'address bar': address_bar,
+
+        'back[ward]': back,
+        'forward': forward,
+        'reload': Key('cmd-r'),
+        'hard reload': Key('cmd-shift-r'),
+
+        'new tab': new_tab,
+        'close tab': close_tab,
+        '(reopen | unclose) tab': reopen_tab,
+
+        'next tab': step_tab(1),
+        '(last | prevous) tab': step_tab(-1),
+
+        'tab ' + numerals: with_number(jump_tab),
+        '(end | rightmost) tab': rightmost_tab,
+        'tab count ' + numerals: with_number(set_tab_count),
+
+        'toggle dev tools': Key('cmd-alt-i'),
+
+        'command [menu]': Key('cmd-shift-p'),
+        'next panel': next_panel,
+        '(last | prevous) panel': last_panel,
+        '[show] application [panel]': lambda m: show_panel('Application'),
+        '[show] audit[s] [panel]': lambda m: show_panel('Audits'),
+        '[show] console [panel]': lambda m: show_panel('Console'),
+        '[show] element[s] [panel]': lambda m: show_panel('Elements'),
+        '[show] memory [panel]': lambda m: show_panel('Memory'),
+        '[show] network [panel]': lambda m: show_panel('Network'),
+        '[show] performance [panel]': lambda m: show_panel('Performance'),
+        '[show] security [panel]': lambda m: show_panel('Security'),
+        '[show] source[s] [panel]': lambda m: show_panel('Sources'),
+
+        'refocus page': refocus,
+        '[refocus] dev tools': focus_devtools,
+
+        # Clipboard
+        'paste same style': Key('cmd-alt-shift-v'),
+    })
+
+context = lazy_context('GoogleChrome', 'com.google.Chrome', build_keymap)
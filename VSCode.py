@@ -1,11 +1,51 @@
-from talon.voice import Context, Key, press, Str
-from user.utils import parse_words_as_integer
+from user.keystrokes import Key, Plan
+from user.utils import lazy_context, numerals, with_number
+from user import ipc, shared_keymap
+import os
 
-context = Context('VSCode', bundle='com.microsoft.VSCode')
+# Socket the VSCode side of the navigation channel listens on, see ipc.py
+# Requests look like {"command": "jumpToLine", "line": 42}, and VSCode responds with {"line": 42}, the line it actually moved to
+ipc_address = os.path.expanduser('~/.talon/vscode.sock')
 
-def jump_to_line(m):
-    line_number = parse_words_as_integer(m._words[1:])
+# Navigates by pressing the same keys a user would
+class KeystrokeNavigation:
+    def jump_to_line(self, line_number):
+        # All keystrokes are sent together at the end
+        plan = Plan()
 
+        # Open the jump to line input
+        plan.key('ctrl-g')
+
+        # TODO: If requesting line that is beyond the end of the focused document, jump to last line instead
+
+        # Enter whole line number data as if from keyboard
+        plan.text(str(line_number))
+
+        # Confirm the navigation
+        plan.key('enter')
+
+        # Position cursor at the beginning of meaningful text on the current line (Mac OS X)
+        plan.key('cmd-right')
+        plan.key('cmd-left')
+
+        plan.send()
+
+# Navigates by asking VSCode directly, in one round trip, falling back to keystrokes while VSCode isn't listening
+# VSCode clamps lines beyond the end of the focused document to the last line, and leaves the cursor at the first meaningful text
+class IpcNavigation:
+    def __init__(self, channel, fallback):
+        self.channel = channel
+        self.fallback = fallback
+
+    def jump_to_line(self, line_number):
+        try:
+            self.channel.request({'command': 'jumpToLine', 'line': line_number})
+        except ipc.Unavailable:
+            self.fallback.jump_to_line(line_number)
+
+navigation = IpcNavigation(ipc.Channel(ipc_address), KeystrokeNavigation())
+
+def jump_to_line(m, line_number):
     if line_number == None:
         return
 
@@ -13,53 +53,36 @@ def jump_to_line(m):
     if line_number == 0:
         line_number = 1
 
-    # TODO: Directly interface with VSCode to accomplish the following
+    navigation.jump_to_line(line_number)
 
-    # Open the jump to line input
-    press('ctrl-g')
-
-    # TODO: If requesting line that is beyond the end of the focused document, jump to last line instead
+def jump_to_next_word_instance(m):
+    plan = Plan()
+    plan.key('escape')
+    plan.key('cmd-f')
+    plan.insert(' '.join([str(s) for s in m.dgndictation[0]._words]), 'VSCode')
+    plan.key('escape')
+    plan.send()
 
-    # Enter whole line number data as if from keyboard
-    Str(str(line_number))(None)
+# Only built once the application has focus, see utils.lazy_context
+def build_keymap():
+    return shared_keymap.keymap(['clipboard', 'find'], {
+        # Navigating text
+        'line ' + numerals: with_number(jump_to_line),
+        'jump word': Key('alt-right'),
+        'jump left word': Key('alt-left'),
 
-    # Confirm the navigation
-    press('enter')
+        # Selecting text
+        'select line': Key('cmd-right cmd-shift-left'),
+        'select start': Key('cmd-shift-left'),
+        'select end': Key('cmd-shift-right'),
+        'select word': Key('alt-shift-right'),
+        'select left word': Key('alt-shift-left'),
+        'select right': Key('shift-right'),
+        'select left': Key('shift-left'),
+        'select instances': Key('cmd-shift-l'),
 
-    # Position cursor at the beginning of meaningful text on the current line (Mac OS X)
-    press('cmd-right')
-    press('cmd-left')
+        # Finding text
+        'find next <dgndictation>': jump_to_next_word_instance,
+    })
 
-def jump_to_next_word_instance(m):
-    press('escape')
-    press('cmd-f')
-    Str(' '.join([str(s) for s in m.dgndictation[0]._words]))(None)
-    press('escape')
-
-context.keymap({
-    # Navigating text
-    'line (0 | oh | 1 | 2 | 3 | 4 | 5 | 6 | 7 | 8 | 9)+': jump_to_line,
-    'jump word': Key('alt-right'),
-    'jump left word': Key('alt-left'),
-
-    # Selecting text
-    'select line': Key('cmd-right cmd-shift-left'),
-    'select start': Key('cmd-shift-left'),
-    'select end': Key('cmd-shift-right'),
-    'select word': Key('alt-shift-right'),
-    'select left word': Key('alt-shift-left'),
-    'select right': Key('shift-right'),
-    'select left': Key('shift-left'),
-    'select instances': Key('cmd-shift-l'),
-
-    # Finding text
-    'find': Key('cmd-f'),
-    'next': Key('cmd-g'),
-    '(previous | last)': Key('cmd-shift-g'),
-    'find next <dgndictation>': jump_to_next_word_instance,
-
-    # Clipboard
-    'cut': Key('cmd-x'),
-    'copy': Key('cmd-c'),
-    'paste': Key('cmd-v'),
-})
+context = lazy_context('VSCode', 'com.microsoft.VSCode', build_keymap)
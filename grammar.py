@@ -0,0 +1,234 @@
+# Helpers for working with Talon Rule syntax outside of Talon itself
+# To use in other files, for example: "from user import grammar" or "from . import grammar"
+# Supports words, alternatives "(a | b)", optional groups "[a]", and the "+" and "*" repetition suffixes
+
+import time
+
+# Splits a Rule into its syntax characters and words
+def tokenize(rule):
+    tokens = []
+    word = ''
+
+    for c in rule:
+        if c in '()[]|+*':
+            if word:
+                tokens.append(word)
+                word = ''
+            tokens.append(c)
+        elif c == ' ':
+            if word:
+                tokens.append(word)
+                word = ''
+        else:
+            word += c
+
+    if word:
+        tokens.append(word)
+
+    return tokens
+
+# Parses a Rule into nested tuples:
+#   ('seq', [items]), ('alt', [seqs]), ('opt', seq), ('rep', item, minimum), ('word', text)
+# Captures like "<dgndictation>" and lists like "{keys.modifiers}" are kept as plain words
+def parse(rule):
+    tokens = tokenize(rule)
+    position = 0
+
+    def parse_alternatives(closing):
+        nonlocal position
+        options = [parse_sequence(closing)]
+        while position < len(tokens) and tokens[position] == '|':
+            position += 1
+            options.append(parse_sequence(closing))
+        return options[0] if len(options) == 1 else ('alt', options)
+
+    def parse_sequence(closing):
+        nonlocal position
+        items = []
+
+        while position < len(tokens) and tokens[position] not in ('|', closing):
+            token = tokens[position]
+            position += 1
+
+            if token == '(':
+                item = parse_alternatives(')')
+                position += 1
+            elif token == '[':
+                item = ('opt', parse_alternatives(']'))
+                position += 1
+            elif token in ('+', '*', ')', ']'):
+                raise ValueError('Unexpected "%s" in rule: %s'%(token, rule))
+            else:
+                item = ('word', token)
+
+            if position < len(tokens) and tokens[position] in ('+', '*'):
+                item = ('rep', item, 1 if tokens[position] == '+' else 0)
+                position += 1
+
+            items.append(item)
+
+        return ('seq', items)
+
+    tree = parse_alternatives(None)
+
+    if position != len(tokens):
+        raise ValueError('Unbalanced rule: %s'%(rule))
+
+    return tree
+
+# Expands a Rule into every word sequence it can match
+# Only valid for finite Rules (no "+" or "*" repetition)
+def expand(rule):
+    return [tuple(words) for words in _expand(parse(rule))]
+
+def _expand(node):
+    kind = node[0]
+
+    if kind == 'word':
+        return [[node[1]]]
+    if kind == 'opt':
+        return [[]] + _expand(node[1])
+    if kind == 'alt':
+        return [words for option in node[1] for words in _expand(option)]
+    if kind == 'seq':
+        results = [[]]
+        for item in node[1]:
+            results = [prefix + suffix for prefix in results for suffix in _expand(item)]
+        return results
+
+    raise ValueError('Cannot expand repeating rule element: %s'%(node,))
+
+def _count_alternatives(node):
+    kind = node[0]
+
+    if kind == 'word':
+        return 0
+    if kind in ('opt', 'rep'):
+        return _count_alternatives(node[1])
+    if kind == 'alt':
+        return len(node[1]) + sum(_count_alternatives(option) for option in node[1])
+    return sum(_count_alternatives(item) for item in node[1])
+
+# Summarizes the size of a keymap dictionary (Rule => action)
+def stats(keymap):
+    alternatives = 0
+    words = 0
+
+    for rule in keymap:
+        alternatives += _count_alternatives(parse(rule))
+        words += len([t for t in tokenize(rule) if t not in '()[]|+*'])
+
+    return {
+        'rules': len(keymap),
+        'alternatives': alternatives,
+        'words': words,
+        'characters': sum(len(rule) for rule in keymap),
+    }
+
+# Times a keymap builder function and reports the size of the keymap it generates
+def measure(build, repeat=10):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        keymap = build()
+    elapsed = (time.perf_counter() - start) / repeat
+
+    return {**stats(keymap), 'build_ms': elapsed * 1000}
+
+# Counts the word sequences a parsed Rule can match, without expanding them
+# Repetitions are counted up to repeat_limit times, since "+" and "*" are otherwise unbounded
+def count_expansions(node, repeat_limit=2):
+    kind = node[0]
+
+    if kind == 'word':
+        return 1
+    if kind == 'opt':
+        return 1 + count_expansions(node[1], repeat_limit)
+    if kind == 'alt':
+        return sum(count_expansions(option, repeat_limit) for option in node[1])
+    if kind == 'seq':
+        total = 1
+        for item in node[1]:
+            total *= count_expansions(item, repeat_limit)
+        return total
+
+    # ('rep', item, minimum)
+    count = count_expansions(node[1], repeat_limit)
+    return sum(count ** times for times in range(node[2], repeat_limit + 1))
+
+# An index of every phrase of many keymaps, as a trie of words, so phrases with a common start share their nodes
+# Rules are inserted without expanding them into phrases first, so large Rules like those of keys.py only cost their distinct prefixes
+# Repetitions are indexed up to repeat_limit times, and captures like "<dgndictation>" are indexed as a single word
+class PhraseIndex:
+    # The key of a trie node holding the (context name, Rule) pairs whose phrase ends at that node, which can't be a word
+    owners_key = ''
+
+    def __init__(self, repeat_limit=2):
+        self.root = {}
+        self.repeat_limit = repeat_limit
+        self.node_count = 1
+
+    def add(self, context_name, rule):
+        owner = (context_name, rule)
+        for node in self._insert(parse(rule), [self.root]):
+            owners = node.setdefault(self.owners_key, [])
+            if owner not in owners:
+                owners.append(owner)
+
+    # Inserts a parsed Rule after each of the given trie nodes, returning the distinct nodes where it ends
+    def _insert(self, node, starts):
+        kind = node[0]
+
+        if kind == 'word':
+            ends = []
+            for start in starts:
+                end = start.get(node[1])
+                if end is None:
+                    end = start[node[1]] = {}
+                    self.node_count += 1
+                ends.append(end)
+            return ends
+        if kind == 'opt':
+            return _distinct(starts + self._insert(node[1], starts))
+        if kind == 'alt':
+            return _distinct([end for option in node[1] for end in self._insert(option, starts)])
+        if kind == 'seq':
+            for item in node[1]:
+                starts = self._insert(item, starts)
+            return starts
+
+        # ('rep', item, minimum)
+        ends = list(starts) if node[2] == 0 else []
+        for times in range(1, self.repeat_limit + 1):
+            starts = self._insert(node[1], starts)
+            if times >= node[2]:
+                ends += starts
+        return _distinct(ends)
+
+    # Returns the (context name, Rule) pairs that match the phrase exactly, as indexed
+    def owners(self, words):
+        node = self.root
+        for word in words:
+            node = node.get(word)
+            if node is None:
+                return []
+        return node.get(self.owners_key, [])
+
+    # Yields (words, owners) for every indexed phrase
+    def phrases(self):
+        stack = [((), self.root)]
+        while stack:
+            words, node = stack.pop()
+            for word, child in node.items():
+                if word == self.owners_key:
+                    yield words, child
+                else:
+                    stack.append((words + (word,), child))
+
+    # Yields (words, owners) for every phrase matched by more than one Rule
+    def collisions(self):
+        for words, owners in self.phrases():
+            if len(owners) > 1:
+                yield words, owners
+
+def _distinct(nodes):
+    return list({id(node): node for node in nodes}.values())
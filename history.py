@@ -0,0 +1,99 @@
+# Fixed-capacity history of recently completed Voice Commands
+# To use in other files, for example: "from user import history" then "history.last(3)"
+# Commands are recorded by instrument.py for every keymap registered through it
+
+import json, time
+
+history_capacity = 1000
+
+class Record:
+    __slots__ = ('time', 'context_name', 'action', 'engine_words', 'duration', 'phrase')
+
+    def __init__(self, time, context_name, action, engine_words, duration, phrase):
+        self.time = time
+        self.context_name = context_name
+        self.action = action
+        self.duration = duration
+
+        # The engine's words of the match, as they are, so recording copies nothing
+        self.engine_words = engine_words
+
+        # The number of the phrase that performed the command, see instrument.phrase_count
+        self.phrase = phrase
+
+    # The words are only converted to strings when asked for, keeping recording cheap
+    @property
+    def words(self):
+        if self.engine_words is None:
+            return ()
+        return tuple([str(w) for w in self.engine_words])
+
+# Records are kept in a ring, overwriting the oldest once full, so the history never grows
+records = [None] * history_capacity
+next_index = 0
+
+# Only the words of the match are kept, so the history never holds on to the engine's match objects
+def add(time, context_name, action, m, duration, phrase=None):
+    global next_index
+    records[next_index] = Record(time, context_name, action, None if m is None else m._words, duration, phrase)
+    next_index = (next_index + 1) % history_capacity
+
+# Yields the records, newest first, straight from the ring
+def recent():
+    for i in range(history_capacity):
+        record = records[(next_index - i - 1) % history_capacity]
+        if record is None:
+            return
+        yield record
+
+# Returns up to count of the most recent records, oldest first, optionally skipping the records of one context
+def last(count=1, skip_context=None):
+    found = []
+    for record in recent():
+        if len(found) == count:
+            break
+        if record.context_name != skip_context:
+            found.append(record)
+    found.reverse()
+    return found
+
+def clear():
+    global next_index
+    for i in range(history_capacity):
+        records[i] = None
+    next_index = 0
+
+# Writes the history as JSON lines, oldest first, for offline profiling
+def export(path):
+    # Record times come from the performance counter, which has no fixed starting point
+    clock_offset = time.time() - time.perf_counter()
+
+    with open(path, 'w') as f:
+        for record in last(history_capacity):
+            f.write(json.dumps({
+                'time': round(record.time + clock_offset, 3),
+                'context': record.context_name,
+                'words': record.words,
+                'action': getattr(record.action, '__name__', type(record.action).__name__),
+                'duration_ms': round(record.duration * 1000, 3),
+            }, separators=(',', ':')) + '\n')
+
+    return path
+
+# Writes the phrases of the history in the utterance log format read by tools/replay.py, oldest first
+def export_utterances(path):
+    context_name = None
+
+    with open(path, 'w') as f:
+        for record in last(history_capacity):
+            if not record.engine_words:
+                continue
+
+            # tools/replay.py focuses the application of a Context that has one, and ignores other Contexts
+            if record.context_name != context_name:
+                context_name = record.context_name
+                f.write('@%s\n'%(context_name))
+
+            f.write(' '.join([w.replace(' ', '+') for w in record.words]) + '\n')
+
+    return path
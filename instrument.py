@@ -0,0 +1,185 @@
+# Instruments the actions of keymaps, for measuring what Voice Commands cost
+# To use in other files, register keymaps with "instrument.keymap(context, 'name', {...})" instead of "context.keymap({...})"
+# "talon latency report" (in talon_control.py) prints the latency percentiles of each context to talon.log
+# "talon profile on" and "talon profile off" (in talon_control.py) profile every action in between, writing a report to ~/.talon
+
+from talon.engine import engine
+from user.keystrokes import Str
+from user import history
+import cProfile, heapq, io, math, pstats, time
+
+# Latencies are counted in buckets that grow by a fixed ratio, so a histogram never grows however many commands it records
+# With 4 buckets per doubling from 10 microseconds, 100 buckets cover up to about five minutes, each within 19% of the true value
+histogram_minimum = 0.00001
+histogram_buckets_per_doubling = 4
+histogram_bucket_count = 100
+
+class Histogram:
+    __slots__ = ('counts', 'total')
+
+    def __init__(self):
+        self.counts = [0] * histogram_bucket_count
+        self.total = 0
+
+    def add(self, seconds):
+        if seconds <= histogram_minimum:
+            index = 0
+        else:
+            index = min(int(math.log2(seconds / histogram_minimum) * histogram_buckets_per_doubling), histogram_bucket_count - 1)
+        self.counts[index] += 1
+        self.total += 1
+
+    # Returns the upper bound, in seconds, of the bucket containing the given percentile
+    def percentile(self, percent):
+        if self.total == 0:
+            return None
+
+        rank = max(1, math.ceil(self.total * percent / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return histogram_minimum * 2 ** ((index + 1) / histogram_buckets_per_doubling)
+
+# Latency from recognition of a phrase to the end of its action, per context
+latency_histograms = {}
+
+# When the engine last reported a recognized phrase
+last_phrase_time = None
+
+# The number of phrases the engine has recognized, recorded in the command history so repeater.py can tell which phrase performed each command
+phrase_count = 0
+
+# A phrase event older than this is assumed to belong to a previous phrase, so latency is measured from the start of the action instead
+phrase_time_limit = 5
+
+def on_phrase(m):
+    global last_phrase_time, phrase_count
+    last_phrase_time = time.perf_counter()
+    phrase_count += 1
+
+engine.register('phrase', on_phrase)
+
+def record_latency(context_name, start, end):
+    recognized = last_phrase_time
+    if recognized is None or recognized > start or start - recognized > phrase_time_limit:
+        recognized = start
+
+    histogram = latency_histograms.get(context_name)
+    if histogram is None:
+        histogram = latency_histograms[context_name] = Histogram()
+    histogram.add(end - recognized)
+
+# Counts and times every instrumented action while profiling, by context and Rule
+# Optionally also runs actions under cProfile, keeping the profiles of the slowest calls
+class Profiler:
+    def __init__(self, snapshot_count=0):
+        self.snapshot_count = snapshot_count
+        self.stats = {}
+        self.snapshots = []
+        self.calls = 0
+        self.profiling = False
+
+    def call(self, key, action, m):
+        # cProfile can't profile within itself, so actions run by other actions are only timed
+        profile = None
+        if self.snapshot_count and not self.profiling:
+            profile = cProfile.Profile()
+            self.profiling = True
+
+        start = time.perf_counter()
+        try:
+            if profile is None:
+                return action(m)
+            return profile.runcall(action, m)
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile is not None:
+                self.profiling = False
+            self.add(key, elapsed, profile)
+
+    def add(self, key, elapsed, profile):
+        count, total, longest = self.stats.get(key, (0, 0, 0))
+        self.stats[key] = (count + 1, total + elapsed, max(longest, elapsed))
+        self.calls += 1
+
+        # A heap of the slowest calls, replacing the fastest of them once full
+        if profile is not None:
+            snapshot = (elapsed, self.calls, key, profile)
+            if len(self.snapshots) < self.snapshot_count:
+                heapq.heappush(self.snapshots, snapshot)
+            elif elapsed > self.snapshots[0][0]:
+                heapq.heapreplace(self.snapshots, snapshot)
+
+    # Returns the report as text, with the most costly Rules first
+    def report(self):
+        lines = [
+            '%-60s %8s %10s %10s %10s'%('context: rule', 'count', 'total ms', 'mean us', 'max us'),
+        ]
+        for (context_name, rule), (count, total, longest) in sorted(self.stats.items(), key=lambda item: -item[1][1]):
+            lines.append('%-60s %8d %10.2f %10.1f %10.1f'%(
+                ('%s: %s'%(context_name, rule))[:60], count, total * 1000, total / count * 1000000, longest * 1000000,
+            ))
+
+        for elapsed, _, (context_name, rule), profile in sorted(self.snapshots, reverse=True):
+            stream = io.StringIO()
+            pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(15)
+            lines += ['', '=== %s: %s, %.1f us'%(context_name, rule, elapsed * 1000000), stream.getvalue().strip()]
+
+        return '\n'.join(lines) + '\n'
+
+# The Profiler while profiling, otherwise None, which costs instrumented actions only this check
+profiler = None
+
+def start_profiling(snapshot_count=0):
+    global profiler
+    profiler = Profiler(snapshot_count)
+
+# Stops profiling, writing the report to path, which is returned
+def stop_profiling(path):
+    global profiler
+    stopped, profiler = profiler, None
+
+    if stopped is None:
+        return None
+    with open(path, 'w') as f:
+        f.write(stopped.report())
+    return path
+
+# Wraps a single keymap action (function, lambda, Key, Str, or text) so it is measured
+# Unless remember is False, the completed action is also added to the command history
+def wrap(context_name, action, remember=True, rule=None):
+    # Plain text in a keymap is typed, just like Str
+    if isinstance(action, str):
+        action = Str(action)
+
+    key = (context_name, rule)
+
+    def instrumented(m):
+        phrase = phrase_count
+        start = time.perf_counter()
+        try:
+            if profiler is None:
+                result = action(m)
+            else:
+                result = profiler.call(key, action, m)
+        finally:
+            end = time.perf_counter()
+            record_latency(context_name, start, end)
+
+        if remember:
+            history.add(end, context_name, action, m, end - start, phrase)
+        return result
+
+    instrumented.action = action
+    return instrumented
+
+def keymap(context, context_name, mapping, remember=True):
+    context.keymap({rule: wrap(context_name, action, remember, rule) for rule, action in mapping.items()})
+
+def latency_report():
+    lines = ['[latency] context: count, p50 / p95 / p99 ms']
+    for context_name, histogram in sorted(latency_histograms.items()):
+        percentiles = ' / '.join(['%.2f'%(histogram.percentile(p) * 1000) for p in (50, 95, 99)])
+        lines.append('[latency] %s: %d, %s'%(context_name, histogram.total, percentiles))
+    print('\n'.join(lines))
@@ -0,0 +1,85 @@
+# Sends commands to applications over a local socket, for things that take many keystrokes to do through the UI
+# To use in other files, for example: "from user import ipc" then "channel = ipc.Channel(path)" and "channel.request({'command': ...})"
+# Requests and responses are single lines of JSON; an application listens on a Unix socket path or a ('host', port) address
+# tools/ipc_server.py is a stand-in application that records the requests it receives
+
+import json, socket, threading, time
+
+# Seconds to wait for an application to accept a connection or respond to a request
+request_timeout = 0.25
+
+# Seconds to wait before trying to connect again after an application could not be reached
+# Keeps commands from paying for a failed connection every time while the application isn't listening
+retry_interval = 5
+
+class Unavailable(Exception):
+    pass
+
+# A persistent connection to one application, opened on the first request and reused until it fails
+class Channel:
+    def __init__(self, address):
+        self.address = address
+        self.connection = None
+        self.reader = None
+        self.next_attempt = 0
+        self.lock = threading.Lock()
+        self.connects = 0
+        self.requests = 0
+        self.failures = 0
+
+    def connect(self):
+        if time.perf_counter() < self.next_attempt:
+            raise Unavailable('%s was unreachable recently'%(self.address,))
+
+        family = socket.AF_INET if isinstance(self.address, tuple) else socket.AF_UNIX
+        connection = socket.socket(family, socket.SOCK_STREAM)
+        connection.settimeout(request_timeout)
+        try:
+            connection.connect(self.address)
+        except OSError as e:
+            connection.close()
+            self.next_attempt = time.perf_counter() + retry_interval
+            raise Unavailable('%s: %s'%(self.address, e))
+
+        self.connection = connection
+        self.reader = connection.makefile('rb')
+        self.connects += 1
+
+    def close(self):
+        if self.connection is not None:
+            self.reader.close()
+            self.connection.close()
+        self.connection = None
+        self.reader = None
+
+    def exchange(self, line):
+        self.connection.sendall(line)
+        response = self.reader.readline()
+        if not response:
+            raise ConnectionError('connection closed by application')
+        return json.loads(response.decode('utf-8'))
+
+    # Sends one request and returns the response, raising Unavailable if the application can't be reached
+    # A connection that went stale since the last request, like after the application restarted, is reopened once
+    def request(self, message):
+        line = json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n'
+
+        with self.lock:
+            self.requests += 1
+            try:
+                return self.send(line)
+            except Unavailable:
+                self.failures += 1
+                raise
+
+    def send(self, line):
+        for attempt in range(2):
+            reused = self.connection is not None
+            if not reused:
+                self.connect()
+            try:
+                return self.exchange(line)
+            except (OSError, ValueError) as e:
+                self.close()
+                if not reused or attempt == 1:
+                    raise Unavailable('%s: %s'%(self.address, e))
@@ -2,8 +2,10 @@
 # Also supports all holdable modifier key combinations for use as keyboard-based shortcuts
 # This, combined with other scripts, is my replacement for the Voice Commands in std.py
 
-from talon.voice import Word, Context, Key, Rep, RepPhrase, Str, press
-import string, itertools
+from talon.voice import Word, Context, Rep, RepPhrase, Str, press
+from user import grammar, instrument
+from user.keystrokes import Key
+import string, functools
 
 # Alternate spoken forms must have their own entry
 holdable_keys = {
@@ -21,6 +23,9 @@ holdable_keys = {
     # 'effin': 'fn',
 }
 
+# Modifiers are always pressed in this order, regardless of the order they were spoken
+modifier_order = ['cmd', 'ctrl', 'alt', 'shift', 'fn']
+
 glyph_keys = {}
 operation_keys = {}
 
@@ -127,38 +132,59 @@ operation_keys.update({
     'key mute': 'mute',
 })
 
-def do_shortcut(key_name, m):
-    modifiers = []
-
-    last = ''
-    for w in m._words:
-        w = str(w)
-
-        # Handle the odd case of the function key
-        if w == 'function':
-            pass
-        elif last == 'function' and w == 'key':
-            modifiers.append(holdable_keys['function key'])
-        elif w in holdable_keys:
-            modifiers.append(holdable_keys[w])
+# Every spoken form of every shortcut-able key, mapped to its key name
+# For example: ('hash', 'sign') => '#', ('number', 'pad', 'dot') => 'keypad_decimal'
+def build_shortcut_table():
+    table = {}
+    for phrase, key_name in {**glyph_keys, **operation_keys}.items():
+        for words in grammar.expand(phrase):
+            # Ambiguous spoken forms (like 'bracket') keep the first key defined
+            table.setdefault(words, key_name)
+    return table
+
+shortcut_keys = build_shortcut_table()
+
+# Spoken modifier word sequences, mapped to their key names
+# For example: ('apple',) => 'cmd', ('function', 'key') => 'fn'
+modifier_words = {tuple(phrase.split(' ')): key_name for phrase, key_name in holdable_keys.items()}
+modifier_lengths = sorted({len(words) for words in modifier_words}, reverse=True)
+
+# Resolves the words of a shortcut Rule, like ('shift', 'command', 'air'), into a key chord, like 'cmd-shift-a'
+# Spoken modifier combinations are few, so resolved chords are memoized
+@functools.lru_cache(maxsize=4096)
+def resolve_chord(words):
+    modifiers = set()
+
+    i = 0
+    while i < len(words):
+        for length in modifier_lengths:
+            modifier = modifier_words.get(words[i:i + length])
+            if modifier is not None:
+                modifiers.add(modifier)
+                i += length
+                break
         else:
             break
 
-        last = w
+    return '-'.join([m for m in modifier_order if m in modifiers] + [shortcut_keys[words[i:]]])
 
-    press('-'.join([*list(set(modifiers)), key_name]))
-
-def gen_shortcut(key_name):
-    return lambda m: do_shortcut(key_name, m)
+def do_shortcut(m):
+    press(resolve_chord(tuple(str(w) for w in m._words)))
 
 holdable_key_string = ' | '.join(holdable_keys.keys())
 
+# All shortcut combinations share a single Rule, rather than one Rule per key
+# The matched key is looked up in shortcut_keys when the Rule is dispatched
+def build_shortcut_keymap():
+    key_string = ' | '.join({**glyph_keys, **operation_keys}.keys())
+    return {'(%s)+ (%s)'%(holdable_key_string, key_string): do_shortcut}
+
 context = Context('keys')
-context.keymap({
+instrument.keymap(context, 'keys', {
     # All bare keypresses
     **glyph_keys,
     **{phrase: Key(key_name) for phrase, key_name in operation_keys.items()},
 
     # All shortcut combinations
-    **{'(%s)+ (%s)'%(holdable_key_string, phrase): gen_shortcut(key_name) for phrase, key_name in {**glyph_keys, **operation_keys}.items()},
+    **build_shortcut_keymap(),
 })
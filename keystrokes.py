@@ -0,0 +1,176 @@
+# Batches keystrokes and typed text into as few calls to the OS as possible
+# To use in other files, for example: "from user.keystrokes import Plan"
+# Examples:
+#   Plan().key('ctrl-g').text('42').key('enter').send()
+#   Plan().key('cmd-l').key('escape') => sent as a single Key('cmd-l escape')
+#   'reload page': Plan().key('cmd-r') => Plans can be used directly as keymap actions
+#   Plan().insert(long_text, 'VSCode') => typed or pasted, depending on the length of the text
+#   Key('cmd-c') and Str('text') => drop-in replacements for the Talon actions, which are Plans that can be inspected and repeated
+
+from talon import clip, voice
+import threading, time
+
+# Text longer than this many characters is pasted through the clipboard rather than typed, per context
+# Typing is slow for long text, but pasting replaces the clipboard briefly and may not work in every text field
+# Use None to always type text in a context
+paste_thresholds = {
+    'default': 40,
+}
+
+def set_paste_threshold(context_name, threshold):
+    paste_thresholds[context_name] = threshold
+
+def get_paste_threshold(context_name=None):
+    return paste_thresholds.get(context_name, paste_thresholds['default'])
+
+def should_paste(text, context_name=None):
+    threshold = get_paste_threshold(context_name)
+    return threshold is not None and len(text) > threshold
+
+# Number of pieces of text typed per call when streaming text, see insert_stream
+stream_chunk_size = 8
+
+# Seconds to wait after pasting before restoring the clipboard, so the application can read it first
+clipboard_restore_delay = 0.1
+
+# Sends keystrokes and text through Talon
+class TalonBackend:
+    def key(self, chords):
+        voice.Key(chords)(None)
+
+    def text(self, text):
+        voice.Str(text)(None)
+
+    def paste(self, text):
+        previous = clip.get()
+        clip.set(text)
+        voice.Key('cmd-v')(None)
+
+        # Non-text clipboard contents can't be restored
+        if previous is not None:
+            time.sleep(clipboard_restore_delay)
+            clip.set(previous)
+
+# Records keystrokes and text instead of sending them, for counting backend calls without a live Talon
+# Example:
+#   keystrokes.backend = keystrokes.RecordingBackend()
+#   ... run a handler ...
+#   keystrokes.backend.calls => [('key', 'ctrl-g'), ('text', '42'), ('key', 'enter cmd-right cmd-left')]
+# Also keeps a fake clipboard, the text that would have been inserted, and the number of keys that would have been pressed
+class RecordingBackend:
+    def __init__(self, clipboard=''):
+        self.calls = []
+        self.clipboard = clipboard
+        self.output = ''
+        self.keystrokes = 0
+
+    def key(self, chords):
+        self.calls.append(('key', chords))
+        self.keystrokes += len(chords.split(' '))
+
+    def text(self, text):
+        self.calls.append(('text', text))
+        self.output += text
+        self.keystrokes += len(text)
+
+    def paste(self, text):
+        self.calls.append(('paste', text))
+        previous = self.clipboard
+        self.clipboard = text
+        self.output += self.clipboard
+        self.keystrokes += 1
+        self.clipboard = previous
+
+    def reset(self):
+        calls = self.calls
+        self.calls = []
+        self.output = ''
+        self.keystrokes = 0
+        return calls
+
+backend = TalonBackend()
+
+# Held while a Plan is being sent, so keystrokes from separate commands never interleave
+send_lock = threading.RLock()
+
+class Plan:
+    def __init__(self):
+        self.steps = []
+
+    def _add(self, kind, data, separator):
+        if self.steps and self.steps[-1][0] == kind:
+            # Adjacent steps of the same kind are merged into one backend call
+            self.steps[-1] = (kind, self.steps[-1][1] + separator + data)
+        else:
+            self.steps.append((kind, data))
+        return self
+
+    # Queue one or more space-separated key chords, like 'cmd-right cmd-left'
+    def key(self, chords):
+        return self._add('key', chords, ' ')
+
+    def text(self, text):
+        if text:
+            self._add('text', text, '')
+        return self
+
+    # Queue text to be pasted through the clipboard
+    def paste(self, text):
+        if text:
+            self._add('paste', text, '')
+        return self
+
+    # Queue text to be typed or pasted, depending on its length and the paste threshold of the context
+    def insert(self, text, context_name=None):
+        if should_paste(text, context_name):
+            return self.paste(text)
+        return self.text(text)
+
+    # Append the steps of another Plan to this one
+    def extend(self, plan):
+        for kind, data in plan.steps:
+            self._add(kind, data, ' ' if kind == 'key' else '')
+        return self
+
+    # Returns a new Plan that does everything this Plan does, count times over, in as few calls as possible
+    def repeated(self, count):
+        plan = Plan()
+        for _ in range(count):
+            plan.extend(self)
+        return plan
+
+    def send(self):
+        with send_lock:
+            for kind, data in self.steps:
+                getattr(backend, kind)(data)
+
+    # Allows a Plan to be used directly as a keymap action
+    def __call__(self, m):
+        self.send()
+
+def Key(chords):
+    return Plan().key(chords)
+
+def Str(text):
+    return Plan().text(text)
+
+# Inserts text produced piece by piece, like formatted dictation words, without waiting for all of it
+# Text is typed in chunks as soon as each chunk is available, so the first words appear while the rest are formatted
+# Once the text passes the context's paste threshold, whatever is left is pasted instead
+def insert_stream(pieces, context_name=None):
+    threshold = get_paste_threshold(context_name)
+    pieces = iter(pieces)
+
+    with send_lock:
+        chunk = []
+        length = 0
+        for piece in pieces:
+            chunk.append(piece)
+            length += len(piece)
+            if threshold is not None and length > threshold:
+                Plan().paste(''.join(chunk) + ''.join(pieces)).send()
+                return
+            if len(chunk) >= stream_chunk_size:
+                Plan().text(''.join(chunk)).send()
+                chunk = []
+        Plan().text(''.join(chunk)).send()
@@ -3,7 +3,10 @@
 
 # WARNING: Because this script uses ContextGroup, changes to the script may not be recognized until a Talon restart.
 
-from talon.voice import Context, ContextGroup, Str, talon
+from talon.voice import Context, ContextGroup
+from user.keystrokes import Plan, insert_stream
+from user import instrument, modes
+import functools, sys
 
 capitalization_formatters = ['camel', 'title', 'lower', 'caps']
 separator_formatters = ['cram', 'snake', 'line']
@@ -12,8 +15,8 @@ capitalization_string = ' | '.join(capitalization_formatters)
 formatter_string = ' | '.join(capitalization_formatters + separator_formatters)
 
 def enabled():
-    # HACK: Hook into the enabled-ness of the default talon ContextGroup which can be disabled by TalonControl.py
-    return talon.enabled
+    # Follow the enabled-ness of the default talon ContextGroup, which can be disabled by talon_control.py, see modes.py
+    return modes.enabled
 
 def parse_word(word):
     word = str(word)
@@ -28,21 +31,119 @@ def parse_word(word):
     # '_\\letter', '_\\number', '_\\determiner', '_\\pronound'
     return parts[0]
 
+# Number of distinct engine words whose parsed form is remembered, least recently used first to be forgotten
+# Dictation mostly repeats a small vocabulary, so most words are only parsed once
+lexicon_size = 8192
+
+# Parses an engine word, like 'I\\pronoun' or 'Home Depot', into the words it stands for, like ('I',) or ('Home', 'Depot')
+# Words are interned, so repeated words share one string
+# Cached by the text of the engine word, so callers pass str(word) rather than the engine's Word object
+@functools.lru_cache(maxsize=lexicon_size)
+def lexicon_words(word):
+    # Split on space-separated "words", like "Home Depot"
+    return tuple([sys.intern(w) for w in parse_word(word).split(' ')])
+
+# Spoken words that should be written differently, as {'spoken words': 'written words'}
+# Spoken words are matched regardless of case, and the longest match wins
+# Formatters still apply to the written words, so "phrasing snake jason parser" is written 'json_parser'
+# Examples:
+#   'jason': 'JSON'
+#   'pie test': 'pytest'
+vocabulary = {}
+
+# The vocabulary as a trie of lowercase spoken words, with the written words of a whole match under the None key
+vocabulary_trie = {}
+
+def build_vocabulary_trie(vocabulary):
+    trie = {}
+    for spoken, written in vocabulary.items():
+        node = trie
+        for w in spoken.lower().split(' '):
+            node = node.setdefault(w, {})
+        node[None] = tuple(written.split(' '))
+    return trie
+
+def set_vocabulary(new_vocabulary):
+    global vocabulary, vocabulary_trie
+    vocabulary = dict(new_vocabulary)
+    vocabulary_trie = build_vocabulary_trie(vocabulary)
+
+# Whether the pending words could still become a vocabulary match
+def is_vocabulary_prefix(trie, pending):
+    node = trie
+    for w in pending:
+        node = node.get(w.lower())
+        if node is None:
+            return False
+    return True
+
+# Removes the longest vocabulary match from the start of the pending words, returning its written words, or else the first pending word
+def take_vocabulary_match(trie, pending):
+    node = trie
+    match = None
+    for i, w in enumerate(pending):
+        node = node.get(w.lower())
+        if node is None:
+            break
+        if None in node:
+            match = (i + 1, node[None])
+
+    if match is None:
+        return (pending.pop(0),)
+
+    del pending[:match[0]]
+    return match[1]
+
+# Yields the words with vocabulary replacements made, in a single pass, only holding back words that may be part of a match
+def replace_vocabulary(words, trie=None):
+    if trie is None:
+        trie = vocabulary_trie
+    if not trie:
+        yield from words
+        return
+
+    pending = []
+    for w in words:
+        # Most words can't start a match
+        if not pending and w.lower() not in trie:
+            yield w
+            continue
+
+        pending.append(w)
+        while pending and not is_vocabulary_prefix(trie, pending):
+            yield from take_vocabulary_match(trie, pending)
+
+    while pending:
+        yield from take_vocabulary_match(trie, pending)
+
+# Yields each word of the dictation as it is parsed
+def iter_dgndictation(dgndictation):
+    return replace_vocabulary(w for word in dgndictation._words for w in lexicon_words(str(word)))
+
 def parse_dgndictation(dgndictation):
     word_list = []
+    for word in dgndictation._words:
+        word_list.extend(lexicon_words(str(word)))
 
-    for w in dgndictation._words:
-        # Split on space-separated "words", like "Home Depot"
-        word_list += parse_word(w).split(' ')
-
+    if vocabulary_trie:
+        return list(replace_vocabulary(word_list))
     return word_list
 
-def format(word_list, formatters):
-    # Any capitalization formatting will clear out auto-capitalization (like "Home Depot" and the pronoun I)
-    # If 'lower' is a formatter, this will lowercase the words without requiring an explicit lowercasing later
-    if not formatters.isdisjoint(capitalization_formatters):
-        word_list = [w.lower() for w in word_list]
+def _compose(steps):
+    if len(steps) == 0:
+        # Returns the same string, like an identity function
+        return str
+    if len(steps) == 1:
+        return steps[0]
+
+    inner = _compose(steps[:-1])
+    last = steps[-1]
+    return lambda w: last(inner(w))
 
+# Compiles a set of formatters into a separator and the word transforms for the first and remaining words
+# Each unique set of formatters is only compiled once
+@functools.lru_cache(maxsize=256)
+def compile_formatters(formatters):
     titleAll = False
     upperAll = False
     lowerFirstLetter = False
@@ -67,19 +168,54 @@ def format(word_list, formatters):
     if 'line' in formatters:
         separator = '-'
 
+    steps = []
+
+    # Any capitalization formatting will clear out auto-capitalization (like "Home Depot" and the pronoun I)
+    # If 'lower' is a formatter, this will lowercase the words without requiring an explicit lowercasing later
+    if not formatters.isdisjoint(capitalization_formatters):
+        steps.append(str.lower)
+
     if upperAll:
         # CAPS overrides other capitalization schemes
-        word_list = [w.upper() for w in word_list]
-    else:
-        if titleAll:
-            word_list = [w.capitalize() for w in word_list]
-        if lowerFirstLetter:
-            word_list = [word_list[0].lower()] + word_list[1:]
+        steps.append(str.upper)
+    elif titleAll:
+        steps.append(str.capitalize)
+
+    transform = _compose(steps)
+
+    if lowerFirstLetter and not upperAll:
+        return separator, _compose(steps + [str.lower]), transform
+
+    return separator, transform, transform
+
+def format(word_list, formatters):
+    separator, transform_first, transform = compile_formatters(frozenset(formatters))
+
+    if len(word_list) == 0:
+        return ''
+
+    if transform_first is transform:
+        return separator.join(map(transform, word_list))
+
+    return separator.join([transform_first(word_list[0]), *map(transform, word_list[1:])])
+
+# Yields the formatted words one at a time, each preceded by its separator
+# Joining the results gives the same string as format, without waiting for the whole word list
+def iter_format(words, formatters):
+    separator, transform_first, transform = compile_formatters(frozenset(formatters))
+
+    words = iter(words)
+
+    # Camel's lowercase first letter only affects the first word, so no lookahead is needed
+    for w in words:
+        yield transform_first(w)
+        break
 
-    return separator.join(word_list)
+    for w in words:
+        yield separator + transform(w)
 
 def get_unique_formatters(m):
-    return set([str(w) for w in m._words[1:-1]])
+    return frozenset([str(w) for w in m._words[1:-1]])
 
 # Allowing almost any word or phrase to be entered literally, with optional formatting
 # Examples:
@@ -89,7 +225,7 @@ def get_unique_formatters(m):
 #   "phrasing camel camel title snake this is a test" => 'This_Is_A_Test'
 def formatted_literal_phrase(m):
     if enabled():
-        Str(format(parse_dgndictation(m.dgndictation[0]), get_unique_formatters(m)))(None)
+        insert_stream(iter_format(iter_dgndictation(m.dgndictation[0]), get_unique_formatters(m)), 'literal_string_entry')
 
 # Allowing the input of formatter words, with optional formatting
 # Some formatter words can be entered by using "phrasing", but not all of them accurately, thus this extra method
@@ -99,7 +235,7 @@ def formatted_literal_phrase(m):
 #   "phraser caps caps" => 'CAPS'
 def formatted_literal_formatter(m):
     if enabled():
-        Str(format([parse_word(m._words[-1])], get_unique_formatters(m)))(None)
+        Plan().insert(format([parse_word(m._words[-1])], get_unique_formatters(m)), 'literal_string_entry').send()
 
 # Allowing the input of trigger word 'phrasing', with optional formatting
 # Examples:
@@ -107,12 +243,12 @@ def formatted_literal_formatter(m):
 #   "phraser caps phrasing" => 'PHRASING'
 def formatted_literal_phrasing(m):
     if enabled():
-        Str(format(['phrasing'], get_unique_formatters(m)))(None)
+        Plan().insert(format(['phrasing'], get_unique_formatters(m)), 'literal_string_entry').send()
 
 context_group = ContextGroup('literal_string_entry')
 context = Context('literal_string_entry', group=context_group)
 
-context.keymap({
+instrument.keymap(context, 'literal_string_entry', {
     'phraser (%s)* phrasing'%(capitalization_string): formatted_literal_phrasing,
     'phraser (%s)+'%(formatter_string): formatted_literal_formatter,
     'phrasing (%s)* <dgndictation>'%(formatter_string): formatted_literal_phrase,
@@ -0,0 +1,163 @@
+# Indexes talon.log as it grows, so it can be searched by voice without rescanning it
+# To use in other files, for example: "from user import log_index" then "log_index.talon_log.last_errors(3)"
+# Only the bytes appended since the last query are read, through a memory map, and only byte offsets are kept in memory
+# Indexed lines:
+#   2019-01-18 20:35:05 ERROR ...   => timestamps, and errors
+#   Traceback (most recent call last): => errors
+#   {"time":1547840105.0,"topic":"cmd","event":"grammar reloaded"} => topics and events, written by "talon debugging on" in talon_control.py
+
+from array import array
+import bisect, mmap, os, re, time
+
+talon_log_path = os.path.expanduser('~/.talon/talon.log')
+
+# Each part is optional, since Talon may prefix printed lines with a timestamp and level
+# The lookahead skips lines that can't match any part, without a match object for each
+line_pattern = re.compile(
+    rb'^(?=[0-9{T])'
+    rb'(?:(?P<date>\d{4}-\d\d-\d\d) (?P<hour>\d\d):(?P<minute>\d\d):(?P<second>\d\d)(?: (?P<level>[A-Z]+))?[^\S\n]*)?'
+    rb'(?:\{"time":[\d.]+,"topic":"(?P<topic>[^"]*)"(?:,"event":"(?P<event>[^"]*)")?)?'
+    rb'(?P<traceback>Traceback \(most recent call last\))?',
+    re.MULTILINE,
+)
+
+# Lines that start a new entry, ending the multi-line entry before them, like a traceback
+entry_pattern = re.compile(rb'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d|\{"')
+
+# The most lines returned for a single entry
+entry_line_limit = 40
+
+class LogIndex:
+    def __init__(self, path):
+        self.path = path
+        self.reset()
+
+    def reset(self):
+        self.size = 0
+        self.inode = None
+
+        # Sorted times (seconds since the epoch), and the offset of the first line logged at each
+        self.times = array('d')
+        self.time_offsets = array('Q')
+
+        self.errors = array('Q')
+        self.topics = {}
+        self.events = {}
+
+        # Seconds since the epoch of local midnight, by date, since dates rarely change between lines
+        self.dates = {}
+
+    def offsets(self, table, name):
+        offsets = table.get(name)
+        if offsets is None:
+            offsets = table[name] = array('Q')
+        return offsets
+
+    def date_seconds(self, date):
+        seconds = self.dates.get(date)
+        if seconds is None:
+            year, month, day = date.split(b'-')
+            seconds = self.dates[date] = time.mktime((int(year), int(month), int(day), 0, 0, 0, 0, 0, -1))
+        return seconds
+
+    # Indexes whatever has been appended to the log since the last update, starting over if the log was replaced or truncated
+    # Returns the number of bytes read
+    def update(self):
+        try:
+            status = os.stat(self.path)
+        except OSError:
+            self.reset()
+            return 0
+
+        if status.st_ino != self.inode or status.st_size < self.size:
+            self.reset()
+            self.inode = status.st_ino
+        if status.st_size == self.size:
+            return 0
+
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), status.st_size, access=mmap.ACCESS_READ) as data:
+            # A partially written last line is left for the next update
+            end = data.rfind(b'\n', self.size) + 1
+            if end == 0:
+                return 0
+            self.scan(data, self.size, end)
+
+        start, self.size = self.size, end
+        return end - start
+
+    def scan(self, data, start, end):
+        times = self.times
+        last_time = times[-1] if times else None
+
+        for match in line_pattern.finditer(data, start, end):
+            offset = match.start()
+            date, hour, minute, second, level, topic, event, traceback = match.groups()
+
+            if date is not None:
+                seconds = self.date_seconds(date) + int(hour) * 3600 + int(minute) * 60 + int(second)
+                if seconds != last_time:
+                    times.append(seconds)
+                    self.time_offsets.append(offset)
+                    last_time = seconds
+            if level == b'ERROR' or (traceback is not None and not self.follows_error(data, offset)):
+                self.errors.append(offset)
+            if topic is not None:
+                self.offsets(self.topics, topic.decode('utf-8', 'replace')).append(offset)
+                if event is not None:
+                    self.offsets(self.events, event.decode('utf-8', 'replace')).append(offset)
+
+    # Whether the line at offset directly follows an error line, like the traceback of a logged error, which is part of that error
+    def follows_error(self, data, offset):
+        return len(self.errors) > 0 and self.errors[-1] == data.rfind(b'\n', 0, offset - 1) + 1
+
+    # Returns the entries starting at each of the offsets, as text, each of up to line_limit lines
+    def read_entries(self, offsets, line_limit=entry_line_limit):
+        entries = []
+        if not offsets:
+            return entries
+
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), self.size, access=mmap.ACCESS_READ) as data:
+            for offset in offsets:
+                lines = []
+                position = offset
+                while position < self.size and len(lines) < line_limit:
+                    line_end = data.find(b'\n', position, self.size)
+                    if line_end == -1:
+                        line_end = self.size
+                    if lines and entry_pattern.match(data, position):
+                        break
+                    lines.append(data[position:line_end].decode('utf-8', 'replace'))
+                    position = line_end + 1
+                entries.append('\n'.join(lines))
+
+        return entries
+
+    # The most recent errors and tracebacks, oldest first
+    def last_errors(self, count=3):
+        self.update()
+        return self.read_entries(self.errors[-count:])
+
+    # The most recent lines logged for a debugging topic, like 'phrase', oldest first
+    def last_topic(self, topic, count=10):
+        self.update()
+        return self.read_entries(self.topics.get(topic, array('Q'))[-count:], 1)
+
+    # The most recent lines logged for an event, like 'grammar reloaded', oldest first
+    def last_event(self, event, count=10):
+        self.update()
+        return self.read_entries(self.events.get(event, array('Q'))[-count:], 1)
+
+    # The byte offset of the first timestamped line logged at or after the given time, in seconds since the epoch
+    def offset_at(self, seconds):
+        self.update()
+        index = bisect.bisect_left(self.times, seconds)
+        if index == len(self.times):
+            return self.size
+        return self.time_offsets[index]
+
+    # Errors logged at or after the given time, in seconds since the epoch
+    def errors_since(self, seconds):
+        offset = self.offset_at(seconds)
+        return self.read_entries(self.errors[bisect.bisect_left(self.errors, offset):])
+
+talon_log = LogIndex(talon_log_path)
@@ -0,0 +1,83 @@
+# Tracks which recognition mode Talon is in, and switches between them with only the calls each switch needs
+# To use in other files, for example: "from user import modes" then "if modes.enabled: ..." or "modes.subscribe(on_mode)"
+# Modes:
+#   'sleep' - The default talon ContextGroup is disabled, leaving only Voice Commands in other ContextGroups, like talon_control.py
+#   'standard' - Talon recognition, with Dragon dictation asleep
+#   'dragon' - Dragon dictation, with the default talon ContextGroup disabled
+# Only changes made through this module are known, so the default talon ContextGroup should not be enabled or disabled elsewhere
+
+from talon import app
+from talon.api import lib
+from talon.engine import engine
+from talon.voice import talon
+
+# Whether each mode enables the default talon ContextGroup, and wakes Dragon dictation (None leaves Dragon as it is)
+mode_settings = {
+    'sleep': (False, None),
+    'standard': (True, False),
+    'dragon': (False, True),
+}
+
+# The current mode, None until the first switch
+mode = None
+
+# Whether the default talon ContextGroup is enabled, for Voice Commands in other ContextGroups that should only act while it is
+# Starts as Talon has it, since nothing may switch modes, like when talon_control.py isn't loaded
+enabled = talon.enabled
+
+# What was last set, with None where unknown, so switches skip calls that wouldn't change anything
+talon_enabled = None
+dragon_awake = None
+
+# Called with (previous, mode) after every switch to a different mode
+subscribers = []
+
+def subscribe(callback):
+    subscribers.append(callback)
+
+def set_talon_enabled(enable):
+    global talon_enabled, enabled
+
+    if enable == talon_enabled:
+        return
+
+    if enable:
+        talon.enable()
+        app.icon_color(0, 0.7, 0, 1)
+    else:
+        talon.disable()
+        app.icon_color(1, 0, 0, 1)
+    lib.menu_check(b'!Enable Speech Recognition', enable)
+    talon_enabled = enabled = enable
+
+def set_dragon_awake(awake):
+    global dragon_awake
+
+    if awake is None or awake == dragon_awake:
+        return
+
+    engine.mimic(('wake up' if awake else 'go to sleep').split())
+    dragon_awake = awake
+
+def set_mode(new_mode):
+    global mode, dragon_awake
+
+    enable, awake = mode_settings[new_mode]
+    set_talon_enabled(enable)
+    set_dragon_awake(awake)
+
+    # While Talon is disabled, Dragon can be woken or put to sleep by its own Voice Commands, which this module never sees
+    # So Dragon's state is unknown again, and the next mode that needs it asleep or awake makes sure of it
+    if not enable:
+        dragon_awake = None
+
+    previous, mode = mode, new_mode
+    if previous != new_mode:
+        for callback in subscribers:
+            callback(previous, new_mode)
+
+# Forgets what was last set, so the next switch makes every call, like after something else has changed Talon or Dragon
+def forget():
+    global talon_enabled, dragon_awake
+    talon_enabled = None
+    dragon_awake = None
@@ -1,20 +1,99 @@
 # Used for repeating previous Voice Commands
+# Commands that only press keys or type text are repeated in a few bursts, rather than being replayed once per repetition
 
+from talon.engine import engine
 from talon.voice import Context, Rep, talon
-from user.utils import parse_words_as_integer
+from user.keystrokes import Plan, send_lock
+from user.utils import numerals, with_number
+from user import history, instrument
+import time
 
-# TODO: This could be made more intelligent:
-#         * Apply a timeout after which the command will not repeat previous actions
-#         * Prevent stacking of repetitions upon previous repetitions
-def repeat(m):
-    repeat_count = parse_words_as_integer(m._words[1:])
+# Commands older than this many seconds will not be repeated
+repeat_timeout = 30
 
-    if repeat_count != None and repeat_count >= 2:
-        repeater = Rep(repeat_count - 1)
+# Repeated keystrokes are sent in bursts of this many copies of the command, with a pause between bursts, so the target app isn't flooded
+# Use None to send all repetitions in a single burst
+repeat_burst_size = 20
+repeat_burst_interval = 0.05
+
+def is_recent(record):
+    return time.perf_counter() - record.time <= repeat_timeout
+
+def send_repeated(plan, count):
+    burst_size = repeat_burst_size or count
+    with send_lock:
+        while count > 0:
+            burst = min(count, burst_size)
+            plan.repeated(burst).send()
+            count -= burst
+            if count > 0:
+                time.sleep(repeat_burst_interval)
+
+# Returns the record of the command performed by the phrase before this one, looking past earlier repeats so they don't stack
+# Returns None if that phrase wasn't recorded, like a command of a keymap not registered through instrument.keymap, such as std.py
+def previous_command():
+    expected = instrument.phrase_count - 1
+    for record in history.recent():
+        # Performed during a later phrase, by a repeat
+        if record.phrase is not None and record.phrase > expected:
+            continue
+        if record.phrase != expected:
+            return None
+        if record.context_name != 'repeater':
+            return record
+        expected -= 1
+    return None
+
+def repeat(m, repeat_count):
+    if repeat_count == None or repeat_count < 2:
+        return
+
+    # The command itself was already performed once
+    remaining = repeat_count - 1
+
+    command = previous_command()
+    if command is None:
+        # Let Talon repeat the previous phrase, whatever performed it
+        repeater = Rep(remaining)
+        repeater.ctx = talon
+        return repeater(None)
+
+    if not is_recent(command):
+        return
+
+    if isinstance(command.action, Plan):
+        send_repeated(command.action, remaining)
+    elif command.phrase == instrument.phrase_count - 1:
+        repeater = Rep(remaining)
         repeater.ctx = talon
         return repeater(None)
+    else:
+        # The history only keeps the words of a command, so commands that need their match are recognized again
+        for _ in range(remaining):
+            engine.mimic(command.words)
+
+# Performs the last few commands again, in their original order
+def repeat_commands(m, command_count):
+    if command_count == None or command_count < 1:
+        return
+
+    records = [record for record in history.last(command_count, skip_context='repeater') if is_recent(record)]
+
+    # Consecutive keystroke commands are sent together
+    plan = Plan()
+    for record in records:
+        if isinstance(record.action, Plan):
+            plan.extend(record.action)
+        else:
+            plan.send()
+            plan = Plan()
+            engine.mimic(record.words)
+    plan.send()
 
 context = Context('repeater')
-context.keymap({
-    'repeat (0 | oh | 1 | 2 | 3 | 4 | 5 | 6 | 7 | 8 | 9)+': repeat,
+
+# Repeats skip over the history of this context, so they never stack upon previous repetitions
+instrument.keymap(context, 'repeater', {
+    'repeat ' + numerals: with_number(repeat),
+    'repeat last ' + numerals + ' commands': with_number(repeat_commands),
 })
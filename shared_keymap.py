@@ -0,0 +1,49 @@
+# Voice Commands shared by many applications, defined once, so each application script only lists what is different about it
+# To use in other files, for example: "from user import shared_keymap" then "shared_keymap.keymap(['clipboard'], {...})"
+# Action objects are interned, so every application keymap built from the same layer reuses the same Key objects
+# Examples:
+#   shared_keymap.keymap(['clipboard', 'find'], {'reload': Key('cmd-r')}) => every clipboard and find command, plus reload
+#   shared_keymap.keymap(['find'], {'next': Key('f3')}) => an application that finds the next match differently
+#   shared_keymap.keymap(['find'], {'next': None}) => an application without that command
+
+from user.keystrokes import Key
+
+# Each layer maps Rules to the keys they press
+layers = {
+    'clipboard': {
+        'cut': 'cmd-x',
+        'copy': 'cmd-c',
+        'paste': 'cmd-v',
+    },
+    'find': {
+        'find': 'cmd-f',
+        'next': 'cmd-g',
+        '(previous | last)': 'cmd-shift-g',
+    },
+}
+
+# Shared Key Plans by their chords
+# They are shared between keymaps, so they must not be changed, only sent, repeated, or extended into other Plans
+interned_keys = {}
+
+def key(chords):
+    action = interned_keys.get(chords)
+    if action is None:
+        action = interned_keys[chords] = Key(chords)
+    return action
+
+# Returns a keymap of the Voice Commands of the given layers, then the application's own Voice Commands
+# An application Voice Command replaces a shared one with the same Rule, and None removes it
+def keymap(layer_names, overrides):
+    mapping = {}
+    for name in layer_names:
+        for rule, chords in layers[name].items():
+            mapping[rule] = key(chords)
+
+    for rule, action in overrides.items():
+        if action is None:
+            mapping.pop(rule, None)
+        else:
+            mapping[rule] = action
+
+    return mapping
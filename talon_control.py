@@ -6,34 +6,27 @@
 # WARNING: Because this script uses ContextGroup, changes to the script may not be recognized until a Talon restart.
 
 from talon import app
-from talon.api import lib
 from talon.engine import engine
-from talon.voice import Context, ContextGroup, talon
-import eye_mouse, os
+from talon.voice import Context, ContextGroup
+from user import history, instrument, log_index, modes, utils
+import eye_mouse, os, json, queue, subprocess, threading, time
 
 # Because the Voice Commands on this Context are in their own ContextGroup, they are treated separatedly from the other ContextGroups (including the default one: talon)
 # By disabling the default talon ContextGroup, we can effectively turn off recognition, save for the Voice Commands in this file
+# Switching modes only makes the calls needed to leave the previous mode, see modes.py
 def enable_talon():
-    talon.enable()
-    app.icon_color(0, 0.7, 0, 1)
-    lib.menu_check(b'!Enable Speech Recognition', True)
-
-    # Ensure Dragon dictation is off, even if it wasn't enabled
-    engine.mimic('go to sleep'.split())
+    modes.set_mode('standard')
 
 def disable_talon():
-    talon.disable()
-    app.icon_color(1, 0, 0, 1)
-    lib.menu_check(b'!Enable Speech Recognition', False)
+    modes.set_mode('sleep')
 
 def enable_dragon_mode():
-    disable_talon()
-    engine.mimic('wake up'.split())
+    modes.set_mode('dragon')
 
 # Creates extra menu item for toggling Speech Recognition
 def on_menu(item):
     if item == '!Enable Speech Recognition':
-        if talon.enabled:
+        if modes.enabled:
             disable_talon()
         else:
             enable_talon()
@@ -42,41 +35,137 @@ app.register('menu', on_menu)
 
 
 
+# Debug logging is queued and written to talon.log by a background thread, so it never slows down recognition
+# Each event is written as a single line of JSON
+debug_queue_size = 1000
+
+# None logs every topic, otherwise only these topics are logged, like {'phrase', 'cmd'}
+debug_topics = None
+
+# Log only every Nth event of each topic, to reduce flooding during heavy dictation
+debug_sample_rate = 1
+
+debug_queue = queue.Queue(maxsize=debug_queue_size)
+debug_topic_counts = {}
+debug_dropped_count = 0
+
 # Adapted from debug.py listed in the Slash channel
 def debug_listener(topic, m):
+    global debug_dropped_count
+
+    if debug_topics is not None and topic not in debug_topics:
+        return
+
+    count = debug_topic_counts.get(topic, 0)
+    debug_topic_counts[topic] = count + 1
+    if count % debug_sample_rate != 0:
+        return
+
+    try:
+        debug_queue.put_nowait((time.time(), topic, m))
+    except queue.Full:
+        debug_dropped_count += 1
+
+def format_debug_event(timestamp, topic, m):
+    event = {'time': round(timestamp, 3), 'topic': topic}
+
     if topic == 'cmd' and m['cmd']['cmd'] == 'g.load' and m['success'] == True:
-        print('[grammar reloaded]')
+        event['event'] = 'grammar reloaded'
     else:
-        print(topic, m)
+        event['data'] = m
+
+    return json.dumps(event, default=str, separators=(',', ':'))
+
+def debug_writer():
+    global debug_dropped_count
+    reported_dropped_count = 0
+
+    while True:
+        item = debug_queue.get()
+
+        # Stop after everything queued before debugging was turned off has been written
+        if item is None:
+            return
+
+        if debug_dropped_count != reported_dropped_count:
+            reported_dropped_count = debug_dropped_count
+            print(json.dumps({'event': 'dropped', 'count': reported_dropped_count}, separators=(',', ':')))
+
+        try:
+            print(format_debug_event(*item))
+        except Exception as e:
+            print(json.dumps({'event': 'unloggable', 'topic': item[1], 'error': str(e)}, separators=(',', ':')))
 
 is_debug_enabled = False
 
-def set_debug_enabled(enable):
+def set_debug_logging(enable):
     global is_debug_enabled
 
-    # Respect the enabled-ness of default talon ContextGroup for these Voice Commands
-    # Also, no point in re-registering
-    if not talon.enabled or enable == is_debug_enabled:
+    # No point in re-registering
+    if enable == is_debug_enabled:
         return
 
     if enable:
+        threading.Thread(target=debug_writer, name='talon_control debug writer', daemon=True).start()
         engine.register('', debug_listener)
     else:
         engine.unregister('', debug_listener)
 
+        # Blocks only if the queue is full, until the writer makes room
+        debug_queue.put(None)
+
     is_debug_enabled = enable
 
+# Debug logging is independent of the mode, so it stays on while switching between modes until turned off
+def set_debug_enabled(enable):
+    # Respect the enabled-ness of default talon ContextGroup for these Voice Commands
+    if not modes.enabled:
+        return
+
+    set_debug_logging(enable)
+
+
+
+# Profiling times every Voice Command until it is turned off, then writes a report of the most costly ones
+# Also keeps cProfile profiles of this many of the slowest Voice Commands in the report, which slows every Voice Command while profiling
+profile_snapshot_count = 5
+
+profile_report_path = os.path.expanduser('~/.talon/profile_report.txt')
+
+def set_profiling_enabled(enable):
+    # Respect the enabled-ness of default talon ContextGroup for these Voice Commands
+    if not modes.enabled or enable == (instrument.profiler is not None):
+        return
+
+    if enable:
+        instrument.start_profiling(profile_snapshot_count)
+    else:
+        print('[profile] written to %s'%(instrument.stop_profiling(profile_report_path)))
+
 
 
 def open_debug_log(m):
     # Opens the Talon logs in Console.app, which is where print statements and debugging data is usually sent unless Repl is active
-    os.system('open -a Console ~/.talon/talon.log')
+    # Not waited for, so recognition continues while Console.app starts
+    subprocess.Popen(['open', '-a', 'Console', log_index.talon_log_path])
+
+# Prints entries found in talon.log back into it, each line marked so it isn't indexed again
+def print_log_entries(title, entries):
+    print('[log] %s: %d found'%(title, len(entries)))
+    for entry in entries:
+        print('\n'.join(['[log]   ' + line for line in entry.split('\n')]))
+
+
+
+def export_history():
+    print('[history] exported to %s'%(history.export(os.path.expanduser('~/.talon/command_history.jsonl'))))
+    print('[history] exported to %s'%(history.export_utterances(os.path.expanduser('~/.talon/command_history.log'))))
 
 
 
 def on_eye_control(menu_string):
     # Respect the enabled-ness of default talon ContextGroup for these Voice Commands
-    if talon.enabled:
+    if modes.enabled:
         eye_mouse.on_menu(menu_string)
 
 
@@ -84,7 +173,7 @@ def on_eye_control(menu_string):
 context_group = ContextGroup('talon_control')
 context = Context('talon_control', group=context_group)
 
-context.keymap({
+instrument.keymap(context, 'talon_control', {
     # Enable/disable voice recognition
     'talon [voice] sleep': lambda m: disable_talon(),
     'talon [voice] wake': lambda m: enable_talon(),
@@ -97,9 +186,27 @@ context.keymap({
     'talon [voice] debugging on': lambda m: set_debug_enabled(True),
     'talon [voice] debugging off': lambda m: set_debug_enabled(False),
 
+    # Profile every Voice Command until profiling is turned off, writing a report to ~/.talon/profile_report.txt
+    'talon profile on': lambda m: set_profiling_enabled(True),
+    'talon profile off': lambda m: set_profiling_enabled(False),
+
     # Open talon.log in Console.app
     'talon show log': open_debug_log,
 
+    # Find recent entries of talon.log, and print them to the end of it
+    'talon last errors': lambda m: print_log_entries('last errors', log_index.talon_log.last_errors(3)),
+    'talon log grammar reloads': lambda m: print_log_entries('grammar reloads', log_index.talon_log.last_event('grammar reloaded', 5)),
+    'talon log phrases': lambda m: print_log_entries('phrases', log_index.talon_log.last_topic('phrase', 10)),
+
+    # Print recognition-to-action latency percentiles of each context to talon.log
+    'talon latency report': lambda m: instrument.latency_report(),
+
+    # Print which application Contexts have been loaded, and how much time their predicates take
+    'talon context report': lambda m: (utils.lazy_context_report(), utils.context_matcher_report()),
+
+    # Write the recent command history to ~/.talon for offline profiling, and for replaying with tools/replay.py
+    'talon export history': lambda m: export_history(),
+
     # Toggle various eye tracking systems
     'talon (calibrate | calibration)': lambda m: on_eye_control('Eye Tracking >> Calibrate'),
     'talon mouse [control]': lambda m: on_eye_control('Eye Tracking >> Control Mouse'),
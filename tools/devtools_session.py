@@ -0,0 +1,38 @@
+# Counts the keystrokes sent for a devtools session in Google Chrome, with and without GoogleChrome.track_devtools_state
+# Uses the stand-in Talon in tools/fake_talon
+#
+# Usage:
+#   python tools/devtools_session.py [LOG]
+
+import argparse, os, time
+
+import replay
+
+tools_directory = os.path.dirname(os.path.abspath(__file__))
+
+def main():
+    parser = argparse.ArgumentParser(description='Count the keystrokes saved by tracking the devtools state of Google Chrome')
+    parser.add_argument('log', nargs='?', default=os.path.join(tools_directory, 'logs', 'devtools.log'))
+    args = parser.parse_args()
+
+    replay.load_scripts()
+    from user import GoogleChrome
+
+    entries = list(replay.parse_log(args.log))
+    counts = {}
+    for track in [False, True]:
+        GoogleChrome.track_devtools_state = track
+        GoogleChrome.state.reset()
+
+        session = replay.Replay()
+        start = time.perf_counter()
+        session.run(entries)
+        elapsed = time.perf_counter() - start
+
+        counts[track] = session.keystrokes
+        print('track_devtools_state = %s: %d phrases, %d keystrokes, %.2f ms'%(track, session.phrases, session.keystrokes, elapsed * 1000))
+
+    print('saved %d keystrokes (%.0f%%)'%(counts[False] - counts[True], (counts[False] - counts[True]) / counts[False] * 100))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+# A stand-in for Talon's eye_mouse module, see talon/__init__.py
+from talon import log_call
+
+def on_menu(menu_string):
+    log_call('eye_mouse.on_menu', menu_string)
@@ -0,0 +1,33 @@
+# A stand-in for Talon, for running these scripts offline with tools/replay.py
+# Only the parts of the Talon API used by these scripts are provided
+# Every call that would affect the system is appended to call_log, as (name, args)
+
+call_log = []
+
+def log_call(name, *args):
+    call_log.append((name, args))
+
+class App:
+    def __init__(self):
+        self.listeners = {}
+
+    def register(self, topic, callback):
+        self.listeners.setdefault(topic, []).append(callback)
+
+    def icon_color(self, *color):
+        log_call('app.icon_color', *color)
+
+app = App()
+
+class Clipboard:
+    def __init__(self):
+        self.contents = ''
+
+    def get(self):
+        return self.contents
+
+    def set(self, contents):
+        log_call('clip.set', contents)
+        self.contents = contents
+
+clip = Clipboard()
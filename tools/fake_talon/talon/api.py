@@ -0,0 +1,7 @@
+from talon import log_call
+
+class Lib:
+    def menu_check(self, name, checked):
+        log_call('lib.menu_check', name, checked)
+
+lib = Lib()
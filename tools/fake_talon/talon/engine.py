@@ -0,0 +1,28 @@
+from talon import log_call
+
+class Engine:
+    def __init__(self):
+        self.listeners = {}
+
+    # The empty topic receives every event, as (topic, m)
+    def register(self, topic, callback):
+        log_call('engine.register', topic)
+        self.listeners.setdefault(topic, []).append(callback)
+
+    def unregister(self, topic, callback):
+        log_call('engine.unregister', topic)
+        if callback in self.listeners.get(topic, []):
+            self.listeners[topic].remove(callback)
+
+    def mimic(self, words):
+        log_call('engine.mimic', tuple(words))
+
+    # Sends an event to its listeners, as the real engine would
+    # Only listeners of the empty topic are told the topic, listeners of a specific topic only get the event
+    def emit(self, topic, m):
+        for callback in self.listeners.get(topic, []):
+            callback(m)
+        for callback in self.listeners.get('', []):
+            callback(topic, m)
+
+engine = Engine()
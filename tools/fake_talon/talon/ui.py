@@ -0,0 +1,16 @@
+# A stand-in for talon.ui, see __init__.py
+# tools/replay.py sends a 'win_focus' event for every focus line of a log
+
+listeners = {}
+
+def register(topic, callback):
+    listeners.setdefault(topic, []).append(callback)
+
+def unregister(topic, callback):
+    if callback in listeners.get(topic, []):
+        listeners[topic].remove(callback)
+
+# Listeners only get the window, like those of the real talon.ui
+def emit(topic, win):
+    for callback in listeners.get(topic, []):
+        callback(win)
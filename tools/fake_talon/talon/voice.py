@@ -0,0 +1,180 @@
+# A stand-in for talon.voice, see __init__.py
+# Keymap Rules are matched against whole phrases, and keystrokes are appended to output instead of being sent
+
+from talon import log_call
+from user import grammar
+
+# Every keystroke and piece of text that would have been sent, as ('key', chords) or ('text', text)
+output = []
+
+class Word(str):
+    @property
+    def word(self):
+        return str(self)
+
+class Key:
+    def __init__(self, chords):
+        self.chords = chords
+
+    def __call__(self, m):
+        output.append(('key', self.chords))
+
+class Str:
+    def __init__(self, text):
+        self.text = text
+
+    def __call__(self, m):
+        output.append(('text', self.text))
+
+def press(chord):
+    output.append(('key', chord))
+
+# The action and match of the phrase before the current one, set by tools/replay.py, so Rep can perform it again like Talon does
+previous_phrase = None
+
+class Rep:
+    def __init__(self, count):
+        self.count = count
+        self.ctx = None
+
+    def __call__(self, m):
+        global previous_phrase
+
+        log_call('voice.Rep', self.count)
+        if previous_phrase is None:
+            return
+
+        # A repeat of a repeat doesn't go back any further
+        action, match = previous_phrase
+        previous_phrase = None
+        try:
+            for _ in range(self.count):
+                action(match)
+        finally:
+            previous_phrase = action, match
+
+RepPhrase = Rep
+
+class ContextGroup:
+    def __init__(self, name):
+        self.name = name
+        self.enabled = True
+        self.loaded = False
+
+    def load(self):
+        self.loaded = True
+
+    def enable(self):
+        log_call('talon.enable')
+        self.enabled = True
+
+    def disable(self):
+        log_call('talon.disable')
+        self.enabled = False
+
+# The default ContextGroup, for Contexts without their own
+talon = ContextGroup('talon')
+
+# Every Context, in the order they were created
+contexts = []
+
+class Context:
+    def __init__(self, name, bundle=None, func=None, group=None):
+        self.name = name
+        self.bundle = bundle
+        self.func = func
+        self.group = group or talon
+        self.rules = []
+        self.lists = {}
+        contexts.append(self)
+
+    def keymap(self, mapping):
+        for rule, action in mapping.items():
+            tree = grammar.parse(rule)
+            self.rules.append((rule, tree, action))
+
+    def set_list(self, name, items):
+        self.lists[name] = [tuple(str(item).split(' ')) for item in items]
+
+    def is_active(self, app, win):
+        if not self.group.enabled:
+            return False
+        if self.bundle is not None and self.bundle != app.bundle:
+            return False
+        if self.func is not None and not self.func(app, win):
+            return False
+        return True
+
+class Dictation:
+    def __init__(self, words):
+        self._words = words
+
+class Match:
+    def __init__(self, words, captures):
+        self._words = words
+        self.dgndictation = [Dictation(words[start:end]) for name, start, end in captures if name == 'dgndictation']
+        self.lists = {name: [' '.join(map(str, words[start:end])) for n, start, end in captures if n == name] for name, _, _ in captures}
+
+    def __getitem__(self, name):
+        return self.lists[name]
+
+# Yields (end, captures) for every way node can match words from position start, preferring longer matches
+def match_node(node, words, start):
+    kind = node[0]
+
+    if kind == 'word':
+        text = node[1]
+        if text == '<dgndictation>':
+            for end in range(len(words), start, -1):
+                yield end, (('dgndictation', start, end),)
+        elif text.startswith('{') and text.endswith('}'):
+            context_name, list_name = text[1:-1].split('.', 1)
+            for context in contexts:
+                if context.name == context_name:
+                    for item in context.lists.get(list_name, []):
+                        end = start + len(item)
+                        if tuple(map(str, words[start:end])) == item:
+                            yield end, ((text[1:-1], start, end),)
+        elif start < len(words) and str(words[start]) == text:
+            yield start + 1, ()
+    elif kind == 'opt':
+        yield from match_node(node[1], words, start)
+        yield start, ()
+    elif kind == 'alt':
+        for option in node[1]:
+            yield from match_node(option, words, start)
+    elif kind == 'seq':
+        yield from match_sequence(node[1], 0, words, start)
+    elif kind == 'rep':
+        yield from match_repetition(node[1], node[2], 0, words, start)
+
+def match_sequence(items, index, words, start):
+    if index == len(items):
+        yield start, ()
+        return
+    for end, captures in match_node(items[index], words, start):
+        for sequence_end, sequence_captures in match_sequence(items, index + 1, words, end):
+            yield sequence_end, captures + sequence_captures
+
+def match_repetition(item, minimum, count, words, start):
+    for end, captures in match_node(item, words, start):
+        if end > start:
+            for repetition_end, repetition_captures in match_repetition(item, minimum, count + 1, words, end):
+                yield repetition_end, captures + repetition_captures
+    if count >= minimum:
+        yield start, ()
+
+# Finds the Rule matching the whole phrase, returning (context, rule, action, m), or None
+# Application-specific Contexts take precedence, then Contexts created later, like scripts saved more recently in Talon
+def find_rule(words, app, win):
+    words = [Word(w) for w in words]
+
+    for context in sorted(reversed(contexts), key=lambda c: c.bundle is None and c.func is None):
+        if not context.is_active(app, win):
+            continue
+        for rule, tree, action in context.rules:
+            for end, captures in match_node(tree, words, 0):
+                if end == len(words):
+                    return context, rule, action, Match(words, captures)
+
+    return None
@@ -0,0 +1,131 @@
+# Checks that every combination of literal_string_entry's formatters gives the same text as the original formatting, whether formatted at once or streamed
+# Streamed text is also inserted through keystrokes.insert_stream at several paste thresholds, which must only change how it is sent
+# Fails with an AssertionError at the first mismatch, then optionally times each way of formatting
+#
+# Usage:
+#   python tools/formatters.py [--benchmark] [--repeat 20]
+
+import argparse, itertools, time
+
+import replay
+
+corpus = [
+    'hello world',
+    'this is a test',
+    'Home Depot is open on Sunday',
+    'I think I can',
+    'parse words as integer',
+    'the quick brown fox jumps over the lazy dog',
+    'JSON HTTP request handler',
+    'x',
+]
+
+# The formatters that clear out auto-capitalization, as they were when format_uncompiled was written
+capitalization_formatters = ['camel', 'title', 'lower', 'caps']
+
+# The original, uncompiled formatting of literal_string_entry.format, kept as the reference for both
+def format_uncompiled(word_list, formatters):
+    # Any capitalization formatting will clear out auto-capitalization (like "Home Depot" and the pronoun I)
+    # If 'lower' is a formatter, this will lowercase the words without requiring an explicit lowercasing later
+    if not formatters.isdisjoint(capitalization_formatters):
+        word_list = [w.lower() for w in word_list]
+
+    titleAll = False
+    upperAll = False
+    lowerFirstLetter = False
+
+    separator = ' '
+
+    if 'camel' in formatters:
+        separator = ''
+        titleAll = True
+        lowerFirstLetter = True
+    if 'title' in formatters:
+        titleAll = True
+        lowerFirstLetter = False
+    if 'caps' in formatters:
+        upperAll = True
+        lowerFirstLetter = False
+
+    if 'cram' in formatters:
+        separator = ''
+    if 'snake' in formatters:
+        separator = '_'
+    if 'line' in formatters:
+        separator = '-'
+
+    if upperAll:
+        # CAPS overrides other capitalization schemes
+        word_list = [w.upper() for w in word_list]
+    else:
+        if titleAll:
+            word_list = [w.capitalize() for w in word_list]
+        if lowerFirstLetter:
+            word_list = [word_list[0].lower()] + word_list[1:]
+
+    return separator.join(word_list)
+
+def main():
+    parser = argparse.ArgumentParser(description='Check streamed formatting against formatting at once, for every combination of formatters')
+    parser.add_argument('--thresholds', type=int, nargs='*', default=[0, 10, 40], help='paste thresholds to stream through, besides never pasting')
+    parser.add_argument('--benchmark', action='store_true', help='also time each way of formatting every combination')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    replay.load_scripts()
+    from user import keystrokes, literal_string_entry as entry
+
+    all_formatters = entry.capitalization_formatters + entry.separator_formatters
+    combinations = [frozenset(c) for n in range(len(all_formatters) + 1) for c in itertools.combinations(all_formatters, n)]
+    word_lists = [phrase.split(' ') for phrase in corpus]
+    thresholds = [None] + args.thresholds
+
+    previous_backend = keystrokes.backend
+    previous_thresholds = dict(keystrokes.paste_thresholds)
+    keystrokes.backend = backend = keystrokes.RecordingBackend()
+    try:
+        for formatters in combinations:
+            for words in word_lists:
+                expected = format_uncompiled(words, formatters)
+                assert entry.format(words, formatters) == expected, (words, sorted(formatters), entry.format(words, formatters), expected)
+                streamed = ''.join(entry.iter_format(iter(words), formatters))
+                assert streamed == expected, (words, sorted(formatters), streamed, expected)
+
+                for threshold in thresholds:
+                    keystrokes.set_paste_threshold('literal_string_entry', threshold)
+                    backend.reset()
+                    keystrokes.insert_stream(entry.iter_format(iter(words), formatters), 'literal_string_entry')
+                    assert backend.output == expected, (words, sorted(formatters), threshold, backend.output, expected)
+
+        # Long dictation starts typing before all of it has been formatted, even when the rest is pasted
+        words = corpus[-3].split(' ') * 4
+        keystrokes.set_paste_threshold('literal_string_entry', previous_thresholds['default'])
+        backend.reset()
+        keystrokes.insert_stream(entry.iter_format(iter(words), frozenset()), 'literal_string_entry')
+        calls = backend.reset()
+        assert calls[0][0] == 'text' and calls[-1][0] == 'paste', calls
+    finally:
+        keystrokes.backend = previous_backend
+        keystrokes.paste_thresholds.clear()
+        keystrokes.paste_thresholds.update(previous_thresholds)
+
+    print('%d combinations of formatters, %d phrases, %d paste thresholds: all match'%(len(combinations), len(word_lists), len(thresholds)))
+
+    if not args.benchmark:
+        return
+
+    def format_streamed(words, formatters):
+        return ''.join(entry.iter_format(words, formatters))
+
+    for name, function in [('uncompiled', format_uncompiled), ('format', entry.format), ('iter_format', format_streamed)]:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for formatters in combinations:
+                for words in word_lists:
+                    function(words, formatters)
+        elapsed = time.perf_counter() - start
+        calls = args.repeat * len(combinations) * len(word_lists)
+        print('%-12s %8d calls %8.2f us per call'%(name, calls, elapsed / calls * 1000000))
+
+if __name__ == '__main__':
+    main()
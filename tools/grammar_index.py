@@ -0,0 +1,68 @@
+# Indexes every phrase of every keymap, reporting the size of each context, the largest Rules, and phrases matched by more than one Rule
+# Uses the stand-in Talon in tools/fake_talon, with every application keymap built, see grammar.PhraseIndex
+#
+# Usage:
+#   python tools/grammar_index.py [--repeat-limit 2] [--top 15]
+
+import argparse, time, tracemalloc
+
+import replay
+
+def main():
+    parser = argparse.ArgumentParser(description='Report grammar size and ambiguous phrases across every keymap')
+    parser.add_argument('--repeat-limit', type=int, default=2, help='count and index "+" and "*" repetitions up to this many times')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    from user import grammar, utils
+    utils.lazy_loading = False
+    replay.load_scripts()
+    from talon import voice
+
+    # Contexts without a bundle or func are always active, so their phrases compete with every other context
+    always_active = {context.name for context in voice.contexts if context.bundle is None and context.func is None}
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = grammar.PhraseIndex(args.repeat_limit)
+    sizes = []
+    for context in voice.contexts:
+        nodes = index.node_count
+        for rule, tree, action in context.rules:
+            index.add(context.name, rule)
+            sizes.append((grammar.count_expansions(tree, args.repeat_limit), context.name, rule))
+        print('%-22s %5d rules %12d phrases %10d new trie nodes%s'%(
+            context.name, len(context.rules),
+            sum([size for size, name, rule in sizes if name == context.name]),
+            index.node_count - nodes,
+            '' if context.name in always_active else '  (application)',
+        ))
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print('indexed in %.1f ms: %d trie nodes, %d KiB held, %d KiB peak'%(elapsed * 1000, index.node_count, current // 1024, peak // 1024))
+
+    print('\nlargest rules:')
+    for size, name, rule in sorted(sizes, reverse=True)[:args.top]:
+        print('%12d  %s: %s'%(size, name, rule if len(rule) < 100 else rule[:97] + '...'))
+
+    pairs = {}
+    examples = {}
+    for words, owners in index.collisions():
+        key = tuple(sorted({name for name, rule in owners}))
+        pairs[key] = pairs.get(key, 0) + 1
+        examples.setdefault(key, []).append(' '.join(words))
+
+    # Application contexts are never active together, so phrases they share don't compete, but are defined more than once
+    print('\ncolliding phrases:')
+    for key, count in sorted(pairs.items(), key=lambda item: -item[1]):
+        shown = sorted(examples[key], key=len)[:5]
+        applications = len([name for name in key if name not in always_active])
+        print('%8d  %s: %s%s%s'%(
+            count, ' / '.join(key), ', '.join(['"%s"'%(phrase) for phrase in shown]), ', ...' if count > len(shown) else '',
+            '  (never active together)' if applications > 1 and applications == len(key) else '',
+        ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# Records synthetic commands in history.py's ring buffer, reporting the memory held after each batch, which should stay constant once it is full
+#
+# Usage:
+#   python tools/history_memory.py [--batches 10] [--batch-size 100000]
+
+import argparse, time, tracemalloc
+
+import replay
+
+class BenchmarkMatch:
+    __slots__ = ('_words',)
+
+    def __init__(self, words):
+        self._words = words
+
+def main():
+    parser = argparse.ArgumentParser(description='Report the memory held by the command history as commands are recorded')
+    parser.add_argument('--batches', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=100000)
+    args = parser.parse_args()
+
+    replay.load_scripts()
+    from user import history
+
+    def action(m):
+        pass
+
+    history.clear()
+    tracemalloc.start()
+    try:
+        for batch in range(args.batches):
+            for i in range(args.batch_size):
+                # Each match has its own words, like those of the engine
+                history.add(time.perf_counter(), 'benchmark', action, BenchmarkMatch(['command', 'shift', 'air %d'%(i)]), 0.0001)
+            current, peak = tracemalloc.get_traced_memory()
+            print('%9d commands recorded: %6d KiB held, %6d KiB peak'%((batch + 1) * args.batch_size, current // 1024, peak // 1024))
+    finally:
+        tracemalloc.stop()
+        history.clear()
+
+if __name__ == '__main__':
+    main()
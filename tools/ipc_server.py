@@ -0,0 +1,103 @@
+# A stand-in for an application listening for requests from ipc.py, which records every request it receives
+# Acts like a document of a given number of lines, clamping requested lines the way the VSCode side of VSCode.py's navigation does
+#
+# Usage:
+#   python tools/ipc_server.py [--lines N] [--jumps N]
+# Jumps to lines through VSCode.jump_to_line with the stand-in listening, then after stopping it, comparing the keystrokes and time each takes
+# Fails with an AssertionError if the stand-in didn't receive exactly the expected requests, or the fallback didn't press the expected keys
+
+import argparse, json, os, socket, tempfile, threading, time
+
+import replay
+
+class StandInServer:
+    def __init__(self, address, line_count=100):
+        self.address = address
+        self.line_count = line_count
+        self.requests = []
+        self.connections = []
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(address)
+        self.listener.listen(1)
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    # Closes open connections too, like an application quitting
+    def stop(self):
+        self.listener.close()
+        for connection in self.connections:
+            connection.shutdown(socket.SHUT_RDWR)
+        os.remove(self.address)
+
+    def serve(self):
+        while True:
+            try:
+                connection, _ = self.listener.accept()
+            except OSError:
+                return
+            self.connections.append(connection)
+            threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+
+    def handle(self, connection):
+        with connection, connection.makefile('rb') as reader:
+            for line in reader:
+                request = json.loads(line.decode('utf-8'))
+                self.requests.append(request)
+                connection.sendall(json.dumps(self.respond(request)).encode('utf-8') + b'\n')
+
+    def respond(self, request):
+        if request.get('command') == 'jumpToLine':
+            return {'line': max(1, min(request['line'], self.line_count))}
+        return {'error': 'unknown command'}
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare VSCode navigation over IPC with navigation by keystrokes')
+    parser.add_argument('--lines', type=int, default=100, help='number of lines in the stand-in document')
+    parser.add_argument('--jumps', type=int, default=1000)
+    args = parser.parse_args()
+
+    replay.load_scripts()
+    from user import ipc, keystrokes
+    from user import VSCode
+
+    address = os.path.join(tempfile.mkdtemp(), 'vscode.sock')
+    VSCode.navigation.channel = ipc.Channel(address)
+    keystrokes.backend = keystrokes.RecordingBackend()
+
+    # Spoken lines, some beyond the end of the document, and the lines VSCode.jump_to_line asks for, where line 0 is line 1
+    spoken_lines = [i * 7 % (args.lines * 2) for i in range(args.jumps)]
+    lines = [line or 1 for line in spoken_lines]
+
+    def jump(label):
+        start = time.perf_counter()
+        for line in spoken_lines:
+            VSCode.jump_to_line(None, line)
+        elapsed = time.perf_counter() - start
+        count = keystrokes.backend.keystrokes
+        print('%-10s %d jumps, %d keystrokes, %.1f us per jump'%(label, args.jumps, count, elapsed / args.jumps * 1000000))
+        keystrokes.backend.reset()
+        return count
+
+    server = StandInServer(address, args.lines).start()
+    count = jump('ipc:')
+    channel = VSCode.navigation.channel
+    print('           %d requests received over %d connection(s), last: %s'%(len(server.requests), len(server.connections), server.requests[-1]))
+    assert count == 0, count
+    assert server.requests == [{'command': 'jumpToLine', 'line': line} for line in lines], server.requests[:5]
+    assert len(server.connections) == 1, len(server.connections)
+    server.stop()
+
+    # The open connection is now stale, so the first jump reconnects, fails, and falls back, like every jump after it
+    ipc.retry_interval = 3600
+    count = jump('fallback:')
+    print('           %d connects, %d requests, %d failures'%(channel.connects, channel.requests, channel.failures))
+
+    # ctrl-g, the digits of the line, then enter, cmd-right and cmd-left
+    assert count == sum([4 + len(str(line)) for line in lines]), count
+    assert (channel.connects, channel.requests, channel.failures) == (1, args.jumps * 2, args.jumps), (channel.connects, channel.requests, channel.failures)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+# Times a no-op action with and without instrument.wrap, to check the cost of leaving latency recording on
+#
+# Usage:
+#   python tools/latency.py [--calls 100000]
+
+import argparse, time
+
+import replay
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the overhead of instrumenting a Voice Command')
+    parser.add_argument('--calls', type=int, default=100000)
+    args = parser.parse_args()
+
+    replay.load_scripts()
+    from user import instrument
+
+    def action(m):
+        pass
+
+    instrumented = instrument.wrap('benchmark', action, remember=False)
+
+    for name, function in [('plain', action), ('instrumented', instrumented)]:
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            function(None)
+        elapsed = time.perf_counter() - start
+        print('%-14s %8d calls %8.2f us per call'%(name, args.calls, elapsed / args.calls * 1000000))
+
+if __name__ == '__main__':
+    main()
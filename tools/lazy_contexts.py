@@ -0,0 +1,37 @@
+# Compares memory and grammar size after loading the scripts, with and without lazily loaded application Contexts
+# Uses the stand-in Talon in tools/fake_talon, with no application focused
+#
+# Usage:
+#   python tools/lazy_contexts.py
+
+import os, subprocess, sys
+
+tools_directory = os.path.dirname(os.path.abspath(__file__))
+
+measure_script = '''
+import sys, tracemalloc
+sys.path.insert(0, %r)
+import replay
+from talon import voice
+from user import grammar
+
+tracemalloc.start()
+from user import utils
+utils.lazy_loading = %r
+replay.load_scripts()
+current, peak = tracemalloc.get_traced_memory()
+
+keymap = {rule: action for context in voice.contexts for rule, tree, action in context.rules}
+print('memory %%d KiB, grammar %%s'%%(current // 1024, grammar.stats(keymap)))
+utils.lazy_context_report()
+'''
+
+def main():
+    for lazy_loading in [False, True]:
+        print('lazy_loading = %s'%(lazy_loading))
+        sys.stdout.flush()
+        subprocess.run([sys.executable, '-c', measure_script%(tools_directory, lazy_loading)], check=True)
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# Parses a dictation corpus with and without literal_string_entry's lexicon, checking they match without a vocabulary, then times the vocabulary replacement
+# By default, the corpus is random utterances from a skewed choice of engine words, like real dictation, which mostly repeats common words
+# An utterance log, like the one written by "talon export history", can be used instead
+#
+# Usage:
+#   python tools/lexicon.py [--corpus ~/.talon/command_history.log] [--utterances 100000] [--repeat 1]
+
+import argparse, random, time
+
+import replay
+
+class BenchmarkDictation:
+    __slots__ = ('_words',)
+
+    def __init__(self, words):
+        self._words = words
+
+# The original parsing of literal_string_entry.parse_dgndictation, kept as the reference for the lexicon
+def parse_word(word):
+    word = str(word)
+
+    parts = word.split('\\')
+
+    if len(parts) >= 3:
+        return parts[-1]
+    return parts[0]
+
+def parse_dgndictation_uncached(dgndictation):
+    word_list = []
+    for w in dgndictation._words:
+        word_list.extend(parse_word(w).split(' '))
+    return word_list
+
+def random_corpus(utterances):
+    rng = random.Random(0)
+    common = ['the', 'a', 'to', 'of', 'and', 'is', 'it', 'parse', 'words', 'integer', 'list', 'value', 'request', 'jason', 'file']
+    rare = ['word%d'%(i) for i in range(10000)]
+    engine_words = common + ['I\\pronoun', '.\\period\\period', ',\\comma\\comma', 'Home Depot', 'x\\letter', '5\\number', 'pie', 'test'] + rare
+    weights = [1 / (rank + 1) for rank in range(len(engine_words))]
+    return [rng.choices(engine_words, weights, k=rng.randint(1, 12)) for _ in range(utterances)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare dictation parsing with and without the lexicon')
+    parser.add_argument('--corpus', help='an utterance log, like tools/logs/sample.log')
+    parser.add_argument('--utterances', type=int, default=100000, help='the number of random utterances, without --corpus')
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    replay.load_scripts()
+    from user import literal_string_entry as entry
+
+    if args.corpus:
+        corpus = [words for kind, words in replay.parse_log(args.corpus) if kind == 'phrase']
+    else:
+        corpus = random_corpus(args.utterances)
+    dictations = [BenchmarkDictation(words) for words in corpus]
+
+    previous_vocabulary = entry.vocabulary
+    entry.set_vocabulary({})
+    entry.lexicon_words.cache_clear()
+    try:
+        for d in dictations:
+            parsed, expected = entry.parse_dgndictation(d), parse_dgndictation_uncached(d)
+            assert parsed == expected, (d._words, parsed, expected)
+
+        entry.lexicon_words.cache_clear()
+        for name, function in [('uncached', parse_dgndictation_uncached), ('lexicon', entry.parse_dgndictation)]:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for d in dictations:
+                    function(d)
+            elapsed = time.perf_counter() - start
+            print('%-16s %8d utterances %8.2f us per utterance'%(name, len(dictations) * args.repeat, elapsed / len(dictations) / args.repeat * 1000000))
+
+        entry.set_vocabulary({'jason': 'JSON', 'pie test': 'pytest', 'home depot': 'HomeDepot'})
+        start = time.perf_counter()
+        replaced = [entry.parse_dgndictation(d) for d in dictations]
+        elapsed = time.perf_counter() - start
+        changed = len([d for d, words in zip(dictations, replaced) if words != parse_dgndictation_uncached(d)])
+        print('%-16s %8d utterances %8.2f us per utterance, %d changed'%('with vocabulary', len(dictations), elapsed / len(dictations) * 1000000, changed))
+    finally:
+        entry.set_vocabulary(previous_vocabulary)
+
+    print(entry.lexicon_words.cache_info())
+
+if __name__ == '__main__':
+    main()
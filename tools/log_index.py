@@ -0,0 +1,96 @@
+# Measures log_index.LogIndex on a synthetic talon.log, growing it step by step
+# After each step, reports the time to index the appended bytes, and the latency of queries, which should stay flat as the log grows
+# For comparison, also reports the time to find the last errors by reading the whole log
+#
+# Usage:
+#   python tools/log_index.py [--megabytes 400] [--steps 8]
+
+import argparse, json, os, random, sys, tempfile, time
+
+import replay
+
+# Roughly what a debugging session writes: mostly phrase and cmd events, some printed lines, and the odd error
+def synthetic_block(start_time, lines, rng):
+    out = []
+    for i in range(lines):
+        timestamp = start_time + i * 0.01
+        kind = rng.random()
+        if kind < 0.6:
+            out.append(json.dumps({'time': round(timestamp, 3), 'topic': 'phrase', 'data': {'phrase': ['line', '4', '2']}}, separators=(',', ':')))
+        elif kind < 0.9:
+            out.append(json.dumps({'time': round(timestamp, 3), 'topic': 'cmd', 'data': {'cmd': {'cmd': 'p.end'}}}, separators=(',', ':')))
+        elif kind < 0.9995:
+            out.append('%s IO [lazy contexts] VSCode: built'%(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))))
+        elif kind < 0.9998:
+            out.append(json.dumps({'time': round(timestamp, 3), 'topic': 'cmd', 'event': 'grammar reloaded'}, separators=(',', ':')))
+        else:
+            out.append('%s ERROR failed to run action'%(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))))
+            out.append('Traceback (most recent call last):')
+            out.append('  File "/Users/user/.talon/user/VSCode.py", line 12, in jump_to_line')
+            out.append('ValueError: synthetic error %d'%(i))
+    return ('\n'.join(out) + '\n').encode('utf-8')
+
+# Finds the last errors the way one would without an index
+def scan_whole_log(path):
+    errors = []
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.startswith(b'Traceback') or b' ERROR ' in line[:30]:
+                errors.append(line)
+    return errors[-3:]
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure indexing and query latency of log_index on a growing synthetic log')
+    parser.add_argument('--megabytes', type=int, default=400)
+    parser.add_argument('--steps', type=int, default=8)
+    parser.add_argument('--no-scan', action='store_true', help='skip reading the whole log for comparison')
+    args = parser.parse_args()
+
+    from user import log_index
+
+    rng = random.Random(0)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'talon.log')
+    open(path, 'wb').close()
+
+    index = log_index.LogIndex(path)
+    step_bytes = args.megabytes * 1024 * 1024 // args.steps
+    start_time = time.time() - 86400
+
+    print('%8s %12s %12s %14s %14s %14s %12s'%('MiB', 'index s', 'MiB/s', 'errors us', 'reloads us', 'since us', 'scan ms'))
+    for step in range(args.steps):
+        written = 0
+        with open(path, 'ab') as f:
+            while written < step_bytes:
+                block = synthetic_block(start_time, 20000, rng)
+                start_time += 200
+                f.write(block)
+                written += len(block)
+
+        start = time.perf_counter()
+        indexed = index.update()
+        index_seconds = time.perf_counter() - start
+
+        queries = []
+        for query in [lambda: index.last_errors(3), lambda: index.last_event('grammar reloaded', 5), lambda: index.errors_since(start_time - 600)]:
+            start = time.perf_counter()
+            for _ in range(100):
+                query()
+            queries.append((time.perf_counter() - start) / 100 * 1000000)
+
+        scan = ''
+        if not args.no_scan:
+            start = time.perf_counter()
+            scan_whole_log(path)
+            scan = '%.0f'%((time.perf_counter() - start) * 1000)
+
+        print('%8.0f %12.3f %12.0f %14.1f %14.1f %14.1f %12s'%(
+            index.size / 1024 / 1024, index_seconds, indexed / 1024 / 1024 / index_seconds, queries[0], queries[1], queries[2], scan,
+        ))
+        sys.stdout.flush()
+
+    print('%d errors, %d timestamps, topics: %s'%(len(index.errors), len(index.times), {name: len(offsets) for name, offsets in index.topics.items()}))
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
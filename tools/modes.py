@@ -0,0 +1,55 @@
+# Counts the calls to Talon made by each switch between recognition modes, see modes.py
+# Uses the stand-in Talon in tools/fake_talon, which records every call that would affect the system
+# Fails with an AssertionError if a switch makes a different number of calls than expected
+#
+# Usage:
+#   python tools/modes.py
+
+import replay
+
+# The calls made by each switch, by the mode switched from, then the mode switched to
+# Enabling or disabling Talon takes talon.enable or talon.disable, app.icon_color and lib.menu_check, and waking or sleeping Dragon one engine.mimic
+# Dragon's state is unknown after sleep and dragon modes, since Dragon's own Voice Commands can change it, so leaving them always sets it
+expected_calls = {
+    'dragon': {'dragon': 1, 'sleep': 0, 'standard': 4},
+    'sleep': {'dragon': 1, 'sleep': 0, 'standard': 4},
+    'standard': {'dragon': 4, 'sleep': 3, 'standard': 0},
+}
+
+def main():
+    replay.load_scripts()
+    import talon
+    from user import modes
+
+    names = sorted(modes.mode_settings)
+    print('%-10s'%('from \\ to') + ''.join(['%10s'%(name) for name in names]))
+
+    for previous in names:
+        row = []
+        for mode in names:
+            modes.set_mode(previous)
+            del talon.call_log[:]
+            modes.set_mode(mode)
+            row.append(len(talon.call_log))
+        print('%-10s'%(previous) + ''.join(['%10d'%(count) for count in row]))
+        for mode, count in zip(names, row):
+            assert count == expected_calls[previous][mode], (previous, mode, count, expected_calls[previous][mode])
+
+    # Waking from sleep puts Dragon to sleep, even if it was woken by its own Voice Commands while Talon was asleep
+    modes.set_mode('standard')
+    modes.set_mode('sleep')
+    del talon.call_log[:]
+    modes.set_mode('standard')
+    calls = [(name, args) for name, args in talon.call_log if name == 'engine.mimic']
+    assert len(calls) == 1 and 'sleep' in ' '.join(calls[0][1][0]), talon.call_log
+
+    # Like the first switch after Talon starts, or after modes.forget()
+    print()
+    for mode in names:
+        modes.forget()
+        del talon.call_log[:]
+        modes.set_mode(mode)
+        print('unknown -> %s: %s'%(mode, ', '.join([name for name, args in talon.call_log])))
+
+if __name__ == '__main__':
+    main()
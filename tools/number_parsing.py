@@ -0,0 +1,133 @@
+# Checks utils.parse_words_as_integer on compound and mixed spoken numbers, failing with an AssertionError at the first wrong parse
+# Then times it against the original digit-by-digit parsing, on the digit sequences used by other scripts
+# Then compares the size of per-script number Rules, like those of repeater.py, VSCode.py and GoogleChrome.py before, with Rules using utils.numerals
+# And times dispatching a phrase to a handler that parses its own number, against a handler wrapped with utils.with_number
+#
+# Usage:
+#   python tools/number_parsing.py [--repeat 1000]
+
+import argparse, itertools, time
+
+import replay
+
+# Stands in for Talon words, which the original parsing requires
+class BenchmarkWord(str):
+    @property
+    def word(self):
+        return str(self)
+
+class BenchmarkMatch:
+    def __init__(self, phrase):
+        self._words = [BenchmarkWord(w) for w in phrase.split(' ')]
+
+# The original digit-by-digit parsing of utils.parse_words_as_integer, kept as the reference for both comparisons
+# Reads utils.number_conversions, copied in by main
+number_conversions = {}
+
+def parse_digit_words_as_integer(words):
+    # Ignore any potential trailing non-number words
+    number_words = list(itertools.takewhile(lambda w: str(w) in number_conversions, words))
+
+    # Somehow, no numbers were detected
+    if len(number_words) == 0:
+        return None
+
+    # Map number words to simple number values
+    number_values = list(map(lambda w: number_conversions[w.word], number_words))
+
+    # Join the numbers into single string, and remove leading zeros
+    number_string = ''.join(number_values).lstrip('0')
+
+    # If the entire sequence was zeros, return single zero
+    if len(number_string) == 0:
+        return 0
+
+    return int(number_string)
+
+# Spoken numbers the original parsing couldn't read, and what they should be parsed as
+# A word that can't continue a number starts a new one, whose digits are appended
+compound_numbers = {
+    'twenty three': 23,
+    'one hundred five': 105,
+    'one hundred twenty three': 123,
+    'two thousand': 2000,
+    'three thousand four hundred': 3400,
+    'one million two hundred thousand': 1200000,
+    'twenty three lines': 23,
+    'one two': 12,
+    'nineteen eighty four': 1984,
+    'twenty twenty': 2020,
+    'twenty three four': 234,
+    'oh five': 5,
+    '4 twenty': 420,
+    'two thousand three thousand': 20003000,
+    'two hundred five hundred': 200500,
+    'one hundred twenty hundred': 1002000,
+    'five\\number hundred\\number': 500,
+    'lines': None,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare number parsing, and per-script number Rules with the shared numerals Rule fragment')
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    replay.load_scripts()
+    from user import grammar, utils
+    number_conversions.update(utils.number_conversions)
+
+    phrases = [
+        [BenchmarkWord(w) for w in phrase.split(' ')]
+        for phrase in ['1', '4 2', 'oh 5', '1 2 3 4', '9 9 9', '0 0', '2 5 6 lines']
+    ]
+
+    for phrase in phrases:
+        assert utils.parse_words_as_integer(phrase) == parse_digit_words_as_integer(phrase), phrase
+
+    for phrase, expected in compound_numbers.items():
+        parsed = utils.parse_words_as_integer(phrase.split(' '))
+        assert parsed == expected, (phrase, parsed, expected)
+
+    for name, function in [('digits', parse_digit_words_as_integer), ('parse', utils.parse_words_as_integer)]:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for phrase in phrases:
+                function(phrase)
+        elapsed = time.perf_counter() - start
+        calls = args.repeat * len(phrases)
+        print('%-8s %8d calls %8.2f us per call'%(name, calls, elapsed / calls * 1000000))
+
+    legacy_rules = {
+        'repeat (0 | oh | 1 | 2 | 3 | 4 | 5 | 6 | 7 | 8 | 9)+': None,
+        'line (0 | oh | 1 | 2 | 3 | 4 | 5 | 6 | 7 | 8 | 9)+': None,
+        'tab (1 | 2 | 3 | 4 | 5 | 6 | 7 | 8)': None,
+    }
+    shared_rules = {
+        'repeat ' + utils.numerals: None,
+        'line ' + utils.numerals: None,
+        'tab ' + utils.numerals: None,
+    }
+    print('legacy grammar: %s'%(grammar.stats(legacy_rules)))
+    print('shared grammar: %s'%(grammar.stats(shared_rules)))
+
+    matches = [BenchmarkMatch(phrase) for phrase in ['repeat 5', 'line 4 2', 'line 1 2 3 4', 'tab 3', 'repeat 1 0']]
+
+    def legacy_handler(m):
+        return parse_digit_words_as_integer(m._words[1:])
+
+    shared_handler = utils.with_number(lambda m, number: number)
+
+    for m in matches:
+        assert legacy_handler(m) == shared_handler(m), (m._words, legacy_handler(m), shared_handler(m))
+
+    for name, handler in [('legacy', legacy_handler), ('shared', shared_handler)]:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for m in matches:
+                handler(m)
+        elapsed = time.perf_counter() - start
+        calls = args.repeat * len(matches)
+        print('%-8s %8d calls %8.2f us per call'%(name, calls, elapsed / calls * 1000000))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+# Replays recorded phrases through the real keymaps of these scripts, without a live Talon
+# Uses the stand-in Talon in tools/fake_talon, and reports throughput, per-handler timings, and the keystrokes that would have been sent
+#
+# Usage:
+#   python tools/replay.py LOG [LOG ...] [--repeat N] [--keystrokes OUTPUT]
+#
+# Log format, one entry per line:
+#   # comment
+#   @com.microsoft.VSCode        => focus an application by bundle, or by the name of a Context with a bundle, like "@VSCode"
+#   @com.microsoft.VSCode  Title => ...optionally with a window title, after two or more spaces
+#   line 4 2                     => a recognized phrase, as its words separated by single spaces
+#   phrasing Home+Depot          => "+" joins words the engine recognized as one, like "Home Depot"
+# history.export_utterances writes this format from a live Talon, for "talon export history"
+
+import argparse, os, sys, time, types
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Scripts import each other from "user", like they would from ~/.talon/user
+user = types.ModuleType('user')
+user.__path__ = [root]
+sys.modules['user'] = user
+sys.path.insert(0, os.path.join(root, 'tools', 'fake_talon'))
+
+import importlib
+import talon
+from talon import ui, voice
+from talon.engine import engine
+
+class App:
+    def __init__(self, bundle=None):
+        self.bundle = bundle
+
+# Logs don't say which window of an application was focused, so each application has a single window, with its own id
+class Window:
+    def __init__(self, title='', doc='', id=0):
+        self.title = title
+        self.doc = doc
+        self.id = id
+
+def load_scripts():
+    for name in sorted(os.listdir(root)):
+        if name.endswith('.py'):
+            importlib.import_module('user.' + name[:-3])
+
+def parse_log(path):
+    with open(path) as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line.strip() == '' or line.startswith('#'):
+                continue
+            if line.startswith('@'):
+                target, _, title = line[1:].partition('  ')
+                yield 'focus', (target.strip(), title.strip())
+            else:
+                yield 'phrase', [w.replace('+', ' ') for w in line.split(' ')]
+
+def find_bundle(target):
+    from user.utils import lazy_contexts
+
+    # Lazily loaded Contexts only check their bundle in their func, see utils.lazy_context
+    if target in lazy_contexts:
+        return lazy_contexts[target]['bundle'], True
+
+    for context in voice.contexts:
+        if context.name == target:
+            return context.bundle, context.bundle is not None
+    return target, '.' in target
+
+def handler_name(rule, action):
+    # Unwrap actions registered through instrument.keymap
+    action = getattr(action, 'action', action)
+    name = getattr(action, '__name__', None)
+    if name is None or name == '<lambda>':
+        return rule
+    return name
+
+class Replay:
+    def __init__(self):
+        self.app = App()
+        self.win = Window()
+        self.window_ids = {}
+        self.previous_phrase = None
+        self.phrases = 0
+        self.unmatched = []
+        self.timings = {}
+        self.stream = []
+        self.keystrokes = 0
+
+    def focus(self, target, title):
+        bundle, is_application = find_bundle(target)
+
+        # Contexts without a bundle, like "@keys", are always active
+        if is_application:
+            self.app = App(bundle)
+        self.win = Window(title, id=self.window_ids.setdefault(self.app.bundle, len(self.window_ids) + 1))
+        ui.emit('win_focus', self.win)
+        self.stream.append('@ %s %s'%(self.app.bundle, self.win.title))
+
+    def phrase(self, words):
+        self.phrases += 1
+        engine.emit('phrase', {'phrase': words})
+
+        found = voice.find_rule(words, self.app, self.win)
+        if found is None:
+            self.unmatched.append(' '.join(words))
+            self.stream.append('? %s'%(' '.join(words)))
+            return
+
+        context, rule, action, m = found
+        del voice.output[:]
+
+        voice.previous_phrase = self.previous_phrase
+        start = time.perf_counter()
+        action(m)
+        elapsed = time.perf_counter() - start
+        self.previous_phrase = action, m
+
+        key = (context.name, handler_name(rule, action))
+        count, total, longest = self.timings.get(key, (0, 0, 0))
+        self.timings[key] = (count + 1, total + elapsed, max(longest, elapsed))
+
+        self.stream.append('> %s'%(' '.join(words)))
+        self.stream.extend(['  %s\t%s'%(kind, data) for kind, data in voice.output])
+        self.keystrokes += sum([len(data.split(' ')) if kind == 'key' else len(data) for kind, data in voice.output])
+
+    def run(self, entries):
+        for kind, data in entries:
+            if kind == 'focus':
+                self.focus(*data)
+            else:
+                self.phrase(data)
+
+    def report(self, elapsed):
+        lines = [
+            'phrases: %d, unmatched: %d, keystrokes: %d'%(self.phrases, len(self.unmatched), self.keystrokes),
+            'elapsed: %.3f s, %.0f phrases per second'%(elapsed, self.phrases / elapsed if elapsed else 0),
+            '',
+            '%-55s %8s %10s %10s %10s'%('handler', 'count', 'total ms', 'mean us', 'max us'),
+        ]
+        for (context_name, name), (count, total, longest) in sorted(self.timings.items(), key=lambda item: -item[1][1]):
+            lines.append('%-55s %8d %10.2f %10.1f %10.1f'%(
+                ('%s: %s'%(context_name, name))[:55], count, total * 1000, total / count * 1000000, longest * 1000000,
+            ))
+        if self.unmatched:
+            lines += ['', 'unmatched:'] + sorted(set(self.unmatched))
+        return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded phrases through the keymaps of these scripts')
+    parser.add_argument('logs', nargs='+')
+    parser.add_argument('--repeat', type=int, default=1, help='replay the logs this many times')
+    parser.add_argument('--keystrokes', help='write the keystroke stream to this file, for diffing')
+    args = parser.parse_args()
+
+    load_scripts()
+
+    entries = [entry for path in args.logs for entry in parse_log(path)] * args.repeat
+    replay = Replay()
+
+    start = time.perf_counter()
+    replay.run(entries)
+    elapsed = time.perf_counter() - start
+
+    print(replay.report(elapsed))
+
+    if args.keystrokes:
+        with open(args.keystrokes, 'w') as f:
+            f.write('\n'.join(replay.stream) + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# Measures keymap build time and the number of action objects as the number of application contexts grows
+# Compares application keymaps built from shared_keymap's layers with keymaps that each create their own Key objects, like before
+# Uses the stand-in Talon in tools/fake_talon, whose Context.keymap parses every Rule, standing in for grammar compilation
+#
+# Usage:
+#   python tools/shared_keymap.py [--contexts 1 6 12 24 48]
+
+import argparse, time
+
+import replay
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare shared and copied application keymaps as contexts are added')
+    parser.add_argument('--contexts', type=int, nargs='+', default=[1, 6, 12, 24, 48])
+    parser.add_argument('--runs', type=int, default=5, help='report the fastest of this many builds')
+    args = parser.parse_args()
+
+    replay.load_scripts()
+    from talon import voice
+    from user import shared_keymap, utils
+    from user.keystrokes import Key
+
+    utils.lazy_loading = False
+
+    def own_commands(index):
+        return {'application %d command %d'%(index, i): Key('cmd-%d'%(i)) for i in range(10)}
+
+    def copied_keymap(index):
+        mapping = {rule: Key(chords) for name in ['clipboard', 'find'] for rule, chords in shared_keymap.layers[name].items()}
+        mapping.update(own_commands(index))
+        return mapping
+
+    def shared(index):
+        return shared_keymap.keymap(['clipboard', 'find'], own_commands(index))
+
+    print('%9s %8s %8s %12s %16s'%('contexts', 'keymaps', 'rules', 'build ms', 'action objects'))
+    for count in args.contexts:
+        for name, build_keymap in [('copied', copied_keymap), ('shared', shared)]:
+            timings = []
+            for run in range(args.runs):
+                first = len(voice.contexts)
+                start = time.perf_counter()
+                for index in range(count):
+                    utils.lazy_context('%s %d %d'%(name, count, index), 'com.example.%s%d'%(name, index), lambda index=index: build_keymap(index))
+                timings.append(time.perf_counter() - start)
+            elapsed = min(timings)
+
+            contexts = voice.contexts[first:]
+            actions = [action.action for context in contexts for rule, tree, action in context.rules]
+            print('%9d %8s %8d %12.2f %16d'%(count, name, len(actions), elapsed * 1000, len({id(action) for action in actions})))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# Reports the size and build time of keys.py's shortcut grammar, compared with the previous grammar of one Rule per key
+# Then times keys.resolve_chord for every combination of up to two spoken modifiers with every spoken key, before and after memoizing them
+#
+# Usage:
+#   python tools/shortcuts.py [--repeat 10]
+
+import argparse, itertools, time
+
+import replay
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare keys.py's shortcut grammar with one Rule per key")
+    parser.add_argument('--repeat', type=int, default=10, help='average the build time over this many builds')
+    args = parser.parse_args()
+
+    replay.load_scripts()
+    from user import grammar, keys
+
+    # The previous grammar generated one Rule per key
+    def build_legacy():
+        return {'(%s)+ (%s)'%(keys.holdable_key_string, phrase): lambda m: keys.do_shortcut(m) for phrase in {**keys.glyph_keys, **keys.operation_keys}}
+
+    # Includes expanding every spoken key, which the compact grammar needs at load
+    def build_compact():
+        keys.build_shortcut_table()
+        return keys.build_shortcut_keymap()
+
+    print('%8s %8s %14s %8s %12s %10s'%('grammar', 'rules', 'alternatives', 'words', 'characters', 'build ms'))
+    for name, build in [('legacy', build_legacy), ('compact', build_compact)]:
+        stats = grammar.measure(build, args.repeat)
+        print('%8s %8d %14d %8d %12d %10.2f'%(name, stats['rules'], stats['alternatives'], stats['words'], stats['characters'], stats['build_ms']))
+
+    phrases = [
+        tuple(w for words in modifiers + (key_words,) for w in words)
+        for count in (1, 2)
+        for modifiers in itertools.product(keys.modifier_words, repeat=count)
+        for key_words in keys.shortcut_keys
+    ]
+
+    # The warm pass only uses as many phrases as the cache can hold
+    cached_phrases = phrases[:keys.resolve_chord.cache_info().maxsize]
+
+    print()
+    for name, words_list in [('cold', phrases), ('warm', cached_phrases)]:
+        keys.resolve_chord.cache_clear()
+        if name == 'warm':
+            for words in words_list:
+                keys.resolve_chord(words)
+
+        start = time.perf_counter()
+        for words in words_list:
+            keys.resolve_chord(words)
+        elapsed = time.perf_counter() - start
+        print('%8s %8d phrases %8.2f us per call'%(name, len(words_list), elapsed / len(words_list) * 1000000))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+# Measures how long the scripts take to import, like on a Talon start
+# Each import runs in a fresh Python process, using the stand-in Talon in tools/fake_talon
+#
+# Usage:
+#   python tools/startup.py [--runs N] [--module keys]
+
+import argparse, os, statistics, subprocess, sys
+
+tools_directory = os.path.dirname(os.path.abspath(__file__))
+
+# Imports one script, or every script, and prints the seconds taken
+import_script = '''
+import sys, time
+sys.path.insert(0, %r)
+import replay, importlib
+start = time.perf_counter()
+if %r:
+    importlib.import_module('user.' + %r)
+else:
+    replay.load_scripts()
+print(time.perf_counter() - start)
+'''
+
+def time_import(module):
+    result = subprocess.run(
+        [sys.executable, '-c', import_script%(tools_directory, module, module)],
+        check=True, stdout=subprocess.PIPE, universal_newlines=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Time importing the scripts')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--module', default='', help='a single script to import, like "keys", rather than every script')
+    args = parser.parse_args()
+
+    times = [time_import(args.module) for _ in range(args.runs)]
+    print('%s: median %.2f ms, min %.2f ms over %d runs'%(args.module or 'all scripts', statistics.median(times) * 1000, min(times) * 1000, len(times)))
+
+if __name__ == '__main__':
+    main()
@@ -3,19 +3,117 @@
 
 # NOTE: If you see an error from Talon about "ImportError: cannot import name X", where X is one of these functions, restart Talon
 
-import itertools
+from talon.voice import Context
+from user import grammar, instrument
+import collections, functools, re, time
 
 # Useful for identifying app/window information for context selection
+# Only prints when the focused app or window title changes, since predicates are evaluated on every focus change
+last_context_info = None
+
 def context_func(app, win):
-    print('---')
-    # print(app)
-    print(app.bundle)
-    print(win)
-    print(win.title)
-    print(win.doc)
-    print('---')
+    global last_context_info
+
+    if last_context_info != (app.bundle, win.title):
+        last_context_info = (app.bundle, win.title)
+        print('---')
+        # print(app)
+        print(app.bundle)
+        print(win)
+        print(win.title)
+        print(win.doc)
+        print('---')
     return True
 
+# Every ContextMatcher, for context_matcher_report
+context_matchers = []
+
+# A Context predicate matching an app bundle and/or a window title regex, which caches its result per (bundle, window title)
+# Also counts how often it is evaluated, and the time spent doing so
+# Example: Context('VSCode Python', func=ContextMatcher('com.microsoft.VSCode', r'\.py\b'))
+class ContextMatcher:
+    def __init__(self, bundle=None, title=None, cache_size=256):
+        self.bundle = bundle
+        self.title = re.compile(title) if isinstance(title, str) else title
+        self.cache_size = cache_size
+        self.results = collections.OrderedDict()
+        self.evaluations = 0
+        self.misses = 0
+        self.seconds = 0.0
+        context_matchers.append(self)
+
+    def matches(self, bundle, title):
+        if self.bundle is not None and bundle != self.bundle:
+            return False
+        if self.title is not None and self.title.search(title or '') is None:
+            return False
+        return True
+
+    def __call__(self, app, win):
+        start = time.perf_counter()
+
+        key = (app.bundle, win.title)
+        result = self.results.get(key)
+        if result is None:
+            self.misses += 1
+            result = self.results[key] = self.matches(*key)
+            if len(self.results) > self.cache_size:
+                # Forget the least recently seen window
+                self.results.popitem(last=False)
+        else:
+            self.results.move_to_end(key)
+
+        self.evaluations += 1
+        self.seconds += time.perf_counter() - start
+        return result
+
+    def __repr__(self):
+        return 'ContextMatcher(%r, %r)'%(self.bundle, self.title.pattern if self.title else None)
+
+def context_matcher_report():
+    for matcher in context_matchers:
+        print('[context matchers] %r: %d evaluations, %d misses, %.1f us total'%(matcher, matcher.evaluations, matcher.misses, matcher.seconds * 1000000))
+
+# Application Contexts are registered with only a cheap bundle check, and their keymaps are built the first time the application is focused
+# Set to False to build every keymap at import instead, like before, for comparison
+lazy_loading = True
+
+# Every lazily loaded Context, by name, with the size of its keymap once built
+lazy_contexts = {}
+
+# Creates a Context for an application, whose keymap is built by build_keymap() the first time the application has focus
+# An optional window title regex narrows the Context further, like to one file type
+# Example: context = lazy_context('VSCode', 'com.microsoft.VSCode', build_keymap)
+def lazy_context(name, bundle, build_keymap, title=None):
+    state = lazy_contexts[name] = {'bundle': bundle, 'built': False, 'rules': 0}
+    matcher = ContextMatcher(bundle, title)
+
+    def build():
+        keymap = build_keymap()
+        instrument.keymap(context, name, keymap)
+        state.update(built=True, rules=len(keymap), keymap=keymap)
+
+    def matches(app, win):
+        if not matcher(app, win):
+            return False
+        if not state['built']:
+            build()
+        return True
+
+    context = Context(name, func=matches)
+
+    if not lazy_loading:
+        build()
+
+    return context
+
+def lazy_context_report():
+    for name, state in sorted(lazy_contexts.items()):
+        if state['built']:
+            print('[lazy contexts] %s: built, %s'%(name, grammar.stats(state['keymap'])))
+        else:
+            print('[lazy contexts] %s: waiting for %s'%(name, state['bundle']))
+
 number_conversions = {
     'oh': '0', # 'oh' => zero
 }
@@ -26,23 +124,122 @@ for i, w in enumerate(['zero', 'one', 'two', 'three', 'four', 'five', 'six', 'se
         '%s\\number'%(w): str(i),
     })
 
-# TODO: Once implemented, use number input value rather than manually parsing number words with this function
-def parse_words_as_integer(words):
-    # Ignore any potential trailing non-number words
-    number_words = list(itertools.takewhile(lambda w: str(w) in number_conversions, words))
+# Every number word, mapped to its kind and value, for parsing compound numbers like "one hundred twenty three"
+number_words = {w: ('digit', int(value)) for w, value in number_conversions.items()}
+for kind, names, values in [
+    ('teen', ['ten', 'eleven', 'twelve', 'thirteen', 'fourteen', 'fifteen', 'sixteen', 'seventeen', 'eighteen', 'nineteen'], range(10, 20)),
+    ('tens', ['twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety'], range(20, 100, 10)),
+    ('hundred', ['hundred'], [100]),
+    ('scale', ['thousand', 'million', 'billion'], [1000, 1000000, 1000000000]),
+]:
+    for w, value in zip(names, values):
+        number_words.update({
+            w: (kind, value),
+            '%s\\number'%(w): (kind, value),
+        })
+
+# Which kinds of number words can follow each other within a single compound number
+# Any other word starts a new number, whose digits are appended, like "one two" => 12 or "nineteen eighty four" => 1984
+number_word_followers = {
+    'digit': {'hundred', 'scale'},
+    'teen': {'hundred', 'scale'},
+    'tens': {'digit', 'hundred', 'scale'},
+    'hundred': {'digit', 'teen', 'tens', 'scale'},
+    'scale': {'digit', 'teen', 'tens'},
+}
+
+@functools.lru_cache(maxsize=1024)
+def parse_number_words(words):
+    digits = ''
+    total = 0
+    current = 0
+    last_kind = None
+    last_scale = None
+
+    # The value of the digit, teen and tens words since the last hundred or scale word
+    small = 0
+
+    for w in words:
+        entry = number_words.get(w)
+
+        # Ignore any potential trailing non-number words
+        if entry is None:
+            break
+
+        kind, value = entry
+
+        # The part of the number so far that starts the next number instead, when this word can't continue it
+        # A hundred or scale word takes the words just before it, like "two thousand three thousand" => 2000 then 3000
+        carried = None
+        if last_kind is not None:
+            if kind not in number_word_followers[last_kind] or (kind == 'digit' and last_kind == 'tens' and current % 10 != 0):
+                carried = 0
+            elif kind == 'hundred' and current >= 100:
+                carried = small
+            elif kind == 'scale' and last_scale is not None and value >= last_scale:
+                carried = current
+
+        if carried is not None:
+            digits += str(total + current - carried)
+            total = 0
+            current = small = carried
+            last_scale = None
+
+        if kind == 'hundred':
+            current = (current or 1) * 100
+            small = 0
+        elif kind == 'scale':
+            total += (current or 1) * value
+            current = 0
+            small = 0
+            last_scale = value
+        else:
+            current += value
+            small += value
+
+        last_kind = kind
 
     # Somehow, no numbers were detected
-    if len(number_words) == 0:
+    if last_kind is None:
         return None
 
-    # Map number words to simple number values
-    number_values = list(map(lambda w: number_conversions[w.word], number_words))
-
-    # Join the numbers into single string, and remove leading zeros
-    number_string = ''.join(number_values).lstrip('0')
+    # Remove leading zeros, like "oh five" => 5
+    number_string = (digits + str(total + current)).lstrip('0')
 
     # If the entire sequence was zeros, return single zero
     if len(number_string) == 0:
         return 0
 
     return int(number_string)
+
+# Parses spoken number words, either strings or Talon words, into an integer
+# Examples:
+#   ['one', 'two'] => 12
+#   ['twenty', 'three'] => 23
+#   ['one', 'hundred', 'five'] => 105
+#   ['two', 'thousand'] => 2000
+#   ['oh', 'five', 'lines'] => 5
+# TODO: Once implemented, use number input value rather than manually parsing number words with this function
+def parse_words_as_integer(words):
+    return parse_number_words(tuple([str(w) for w in words]))
+
+# Rule fragment for a spoken number, shared by any Rule that takes one
+# Example: 'line ' + numerals: with_number(jump_to_line)
+numeral_words = ['0', 'oh', '1', '2', '3', '4', '5', '6', '7', '8', '9']
+numerals = '(%s)+'%(' | '.join(numeral_words))
+
+# Finds and parses the first number in the words of a phrase, like ('line', '4', '2') => 42
+@functools.lru_cache(maxsize=1024)
+def parse_phrase_number(words):
+    for i, w in enumerate(words):
+        if w in number_words:
+            return parse_number_words(words[i:])
+    return None
+
+# Wraps a handler for a Rule using numerals, so it is called with the spoken number already parsed
+# Example: with_number(jump_to_line) calls jump_to_line(m, 42) for "line 4 2"
+def with_number(handler):
+    @functools.wraps(handler)
+    def number_handler(m):
+        return handler(m, parse_phrase_number(tuple([str(w) for w in m._words])))
+    return number_handler